@@ -0,0 +1,5 @@
+'''
+    Benchmarks of loading and dumping synthetic documents
+
+    Run all shapes with `python -m benchmarks`, see `--help` for options.
+'''
@@ -0,0 +1,119 @@
+'''
+    Times `OMX.load` and `OMX.dump` on the synthetic documents of `shapes`
+    and prints the results as JSON.
+
+    For each shape a raw `etree.iterparse` pass over the same document is
+    included as a baseline, and loading is timed with both the iterparse
+    and the target engine, along with any cases particular to the shape.
+    Times are the best of `--repeat` runs, peak memory is the peak of Python
+    allocations traced by `tracemalloc` during a separate run and does not
+    include memory allocated by libxml2.
+'''
+
+from __future__ import print_function, division
+
+import argparse
+import copy
+import gc
+import json
+import platform
+import sys
+import timeit
+from io import BytesIO
+from lxml import etree
+
+from omx.load import engines
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+from .shapes import shapes
+
+
+def iterparse(data):
+    for event, element in etree.iterparse(BytesIO(data)):
+        element.clear()
+
+
+def measure(fun, repeat, elements, records):
+    gc.collect()
+    seconds = min(timeit.repeat(fun, number=1, repeat=repeat))
+    result = {
+        'seconds': seconds,
+        'elements_per_sec': elements / seconds,
+        'us_per_record': seconds * 1e6 / records,
+    }
+    if tracemalloc is not None:
+        gc.collect()
+        tracemalloc.start()
+        fun()
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def run(name, scale, repeat):
+    shape = shapes[name](scale)
+    omx, data = shape.omx, shape.data
+    results = {
+        'bytes': len(data),
+        'elements': shape.elements,
+        'records': shape.records,
+    }
+
+    def case(key, fun):
+        results[key] = measure(fun, repeat, shape.elements, shape.records)
+
+    case('iterparse', lambda: iterparse(data))
+    case('load', lambda: omx.load(BytesIO(data)))
+    case('iterload', lambda: list(omx.iterload(BytesIO(data))))
+
+    # The same mapping driven by parser target callbacks
+    target = copy.copy(omx)
+    target.engine = engines['target']
+    case('load_target', lambda: target.load(BytesIO(data)))
+    case('iterload_target', lambda: list(target.iterload(BytesIO(data))))
+
+    if shape.dump:
+        obj = omx.load(BytesIO(data))
+        case('dump', lambda: omx.dump(obj))
+        case('dump_to', lambda: omx.dump_to(obj, BytesIO()))
+
+    for key, fun in shape.cases:
+        case(key, fun)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description=__doc__)
+    parser.add_argument('shapes', nargs='*', choices=[[]] + list(shapes),
+                        help='shapes to run, all by default')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='multiplies the size of the documents')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per case, the best time is reported')
+    parser.add_argument('--output', type=argparse.FileType('w'),
+                        default=sys.stdout, help='file to write JSON to')
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'lxml': '.'.join(map(str, etree.LXML_VERSION)),
+        'libxml2': '.'.join(map(str, etree.LIBXML_VERSION)),
+        'scale': args.scale,
+        'shapes': {},
+    }
+    for name in args.shapes or shapes:
+        report['shapes'][name] = run(name, args.scale, args.repeat)
+
+    json.dump(report, args.output, indent=2, sort_keys=True)
+    args.output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+'''
+    Namespace resolution on deep, namespace heavy documents
+
+    Used by the `namespaces` shape, which compares looking up the namespace
+    of every element through `element.nsmap`, which walks the namespace
+    declarations of all ancestors, with taking it from the clark notation
+    tag.
+'''
+
+from io import BytesIO
+from lxml import etree
+
+from omx import OMX, Namespace
+from omx.plan import split
+
+NAMESPACES = ['http://bench/ns%d' % i for i in range(6)]
+DEPTH = 30
+CHAINS = 500
+
+
+def document(depth=DEPTH, chains=CHAINS):
+    ''' Chains of `depth` nested elements cycling through the namespaces '''
+    decls = ' '.join('xmlns:n%d="%s"' % (i, url)
+                     for i, url in enumerate(NAMESPACES))
+    count = len(NAMESPACES)
+    chain = ''.join('<n%d:node id="%d">' % ((i + 1) % count, i)
+                    for i in range(depth))
+    chain += ''.join('</n%d:node>' % ((i + 1) % count,)
+                     for i in reversed(range(depth)))
+    xml = '<n0:root %s>%s</n0:root>' % (decls, chain * chains)
+    return xml.encode('utf-8')
+
+
+def omx(engine):
+    namespaces = []
+    for i, url in enumerate(NAMESPACES):
+        child = NAMESPACES[(i + 1) % len(NAMESPACES)]
+        ns = Namespace(url, {'c': child})
+        ns.template('node', ('@id', 'c:node'))(
+            lambda uid, children: (uid, children))
+        ns.template('root', ('c:node',))(lambda children: children)
+        namespaces.append(ns)
+    return OMX(namespaces, '{%s}root' % NAMESPACES[0], engine=engine)
+
+
+def nsmap(data):
+    for event, element in etree.iterparse(BytesIO(data), events=('start',)):
+        element.nsmap.get(element.prefix, '')
+
+
+def clark(data):
+    for event, element in etree.iterparse(BytesIO(data), events=('start',)):
+        split(element.tag)[0]
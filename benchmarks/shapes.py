@@ -0,0 +1,153 @@
+'''
+    Synthetic documents of different shapes
+
+    Each shape is a function taking a scale factor and returning a `Shape`
+    with the `OMX` instance to load it with and the serialised document.
+    The documents are generated deterministically so results can be
+    compared between commits.
+'''
+
+import bz2
+import collections
+import gzip
+import lzma
+from io import BytesIO
+
+from omx import OMX, Template
+from omx.columns import column
+from . import namespaces as ns
+
+# `omx` loads `data`, which holds `elements` elements of which `records`
+# are mapped to objects. `dump` is False when the loaded objects can not be
+# dumped back, such as mixed content. `cases` are (key, function) pairs
+# timed in addition to the loads and dumps.
+Shape = collections.namedtuple(
+    'Shape', ('omx', 'data', 'elements', 'records', 'dump', 'cases'),
+    defaults=((),))
+
+
+def document(root, body):
+    return ('<%s>%s</%s>' % (root, ''.join(body), root)).encode('utf-8')
+
+
+def wide(scale):
+    ''' Many siblings with a few attributes and text '''
+    count = 20000 * scale
+    roott = Template('root', ('item',), factory=lambda items: items)
+    itemt = Template('item', ('@key', '@value', 'text()'),
+                     factory=lambda key, value, text: (key, value,
+                                                       ''.join(text)),
+                     serialiser=lambda dump, obj: dump(*obj))
+    body = ('<item key="k%d" value="%d">text %d</item>' % (i, i, i)
+            for i in range(count))
+    return Shape(OMX((roott, itemt), 'root'), document('root', body),
+                 count + 1, count, True)
+
+
+def deep(scale, depth=50):
+    ''' Chains of nested elements each mapped to a object '''
+    chains = 400 * scale
+    roott = Template('root', ('node',), factory=lambda nodes: nodes)
+    nodet = Template('node', ('@id', 'node'),
+                     factory=lambda uid, nodes: (uid, nodes),
+                     serialiser=lambda dump, obj: dump(*obj))
+    chain = (''.join('<node id="%d">' % i for i in range(depth)) +
+             '</node>' * depth)
+    return Shape(OMX((roott, nodet), 'root'),
+                 document('root', [chain] * chains),
+                 depth * chains + 1, depth * chains, True)
+
+
+def attributes(scale, width=40):
+    ''' Elements with many attributes of which only two are mapped '''
+    count = 10000 * scale
+    roott = Template('root', ('row',), factory=lambda rows: rows)
+    rowt = Template('row', ('@a3', '@a17'),
+                    factory=lambda a, b: (a, b),
+                    serialiser=lambda dump, obj: dump(*obj))
+    attrs = ' '.join('a%d="value %d"' % (i, i) for i in range(width))
+    body = ['<row %s/>' % attrs] * count
+    return Shape(OMX((roott, rowt), 'root'), document('root', body),
+                 count + 1, count, True)
+
+
+def mixed(scale):
+    ''' Paragraphs of text mixed with inline elements '''
+    count = 5000 * scale
+    roott = Template('root', ('p',), factory=lambda ps: ps)
+    pt = Template('p', ('text()', 'b/text()', 'i/text()'),
+                  factory=lambda text, bold, italic: (
+                      ''.join(text), [''.join(b) for b in bold],
+                      [''.join(i) for i in italic]))
+    body = ['<p>Some text <b>bold</b> and more text <i>italic</i> with a '
+            '<b>second bold</b> part and a tail.</p>'] * count
+    return Shape(OMX((roott, pt), 'root'), document('root', body),
+                 4 * count + 1, count, False)
+
+
+def namespaces(scale):
+    ''' Deep nesting cycling through six namespaces '''
+    chains = ns.CHAINS * scale
+    data = ns.document(ns.DEPTH, chains)
+    cases = (
+        ('iterparse_nsmap', lambda: ns.nsmap(data)),
+        ('iterparse_clark', lambda: ns.clark(data)),
+    )
+    return Shape(ns.omx('iterparse'), data, ns.DEPTH * chains + 1,
+                 ns.DEPTH * chains, False, cases)
+
+
+def intermediate(scale):
+    ''' Attributes collected through intermediate elements '''
+    count = 20000 * scale
+    roott = Template('root', (), {'persons/person/@name': 'names'},
+                     factory=lambda names: names,
+                     serialiser=lambda dump, obj: dump(names=obj))
+    body = ['<persons>'] + [
+        '<person name="name %d"/>' % i for i in range(count)
+    ] + ['</persons>']
+    return Shape(OMX((roott,), 'root'), document('root', body),
+                 count + 2, count, True)
+
+
+def columns(scale):
+    ''' The rows of `attributes` loaded into arrays by `omx.columns` '''
+    count = 20000 * scale
+    tablet = Template('table', (), {
+        column('l', 'row/@id'): 'ids',
+        column('d', 'row/@value'): 'values',
+    }, factory=lambda ids, values: (ids, values),
+        serialiser=lambda dump, obj: dump(ids=obj[0], values=obj[1]))
+    body = ('<row id="%d" value="%d.5"/>' % (i, i) for i in range(count))
+    return Shape(OMX((tablet,), 'table'), document('table', body),
+                 count + 1, count, True)
+
+
+def compressed(scale):
+    '''
+        The `wide` document compressed, loaded as it is decompressed and
+        after decompressing it whole
+    '''
+    shape = wide(scale)
+    load = shape.omx.load
+    cases = []
+    for name, module in (('gz', gzip), ('bz2', bz2), ('xz', lzma)):
+        data = module.compress(shape.data)
+        cases.append(('load_' + name,
+                      lambda data=data: load(BytesIO(data))))
+        cases.append(('load_' + name + '_decompressed',
+                      lambda data=data, module=module:
+                      load(module.decompress(data))))
+    return shape._replace(dump=False, cases=tuple(cases))
+
+
+shapes = collections.OrderedDict([
+    ('wide', wide),
+    ('deep', deep),
+    ('attributes', attributes),
+    ('mixed', mixed),
+    ('namespaces', namespaces),
+    ('intermediate', intermediate),
+    ('columns', columns),
+    ('compressed', compressed),
+])
@@ -9,13 +9,25 @@ supports far from all parts of the specification (thus xpath like). In
 addition to simple relative paths attributes may be access with @-symbol
 and the text of a node with text(), but no other xpath functions is
 supported.
+
+text() gives the list of text fragments between the children of the node,
+string() the fragments joined and normalize-space() the joined text stripped
+with runs of whitespace collapsed.
+
+Element steps may select their position among the siblings of the same tag
+with a predicate, item[0] for the first or item[2:5] and item[:10] for a
+range. Elements outside the positions are skipped along with their children,
+and a path through single positions only is a singleton target.
+
+Attributes declared as @ref:idref load as the object of the element with the
+id they name, see omx.ref.
 '''
 
 ## TODO / Wishlist
 # Refactor Target singleton checks (method(s) in Target?) Serialisation reusing
 # the same templates XML schema from templates ( relax ng ? ) Aliasing or
 # Template inheritance Easy singleton targets from template decorator / object
-## use [] syntax? like "/foo/bar[0]" ## or something regexp inspired *, +, {3}
+## something regexp inspired *, +, {3}
 
 __all__ = ('OMX', 'template', 'Template')
 
@@ -26,11 +38,25 @@ from .target import Target, Singleton
 class OMX(object):
     ''' Defines how a XML document is converted into objects '''
 
-    def __init__(self, namespace, root):
+    def __init__(self, namespace, root, engine='iterparse'):
+        '''
+            `namespace` a sequence of `Namespace` and free `Template` objects
+
+            `root` the path of the objects returned by `load`
+
+            `engine` how the parser is driven when loading, 'iterparse'
+                walks the elements of `etree.iterparse` and 'target' uses
+                parser target callbacks without creating any elements.
+        '''
+        from .load import engines
         _cls, _paths = decl.target(root)
 
         self.root = root
+        self.engine = engines[engine]
         self.ns = {}
+        self._tags = {}
+        self._plans = {}
+        self._machines = {}
 
         templates = []
         for ns in namespace:
@@ -49,59 +75,235 @@ class OMX(object):
             for t in templates:
                 ns.add_template(t)
 
+    def __getstate__(self):
+        # Compiled plans and states are rebuilt when needed
+        state = dict(self.__dict__)
+        state['_tags'] = {}
+        state['_plans'] = {}
+        state['_machines'] = {}
+        return state
+
     def get_template(self, namespace, path):
         ''' Get the template used to map path into a object '''
         return self.ns[namespace].get_template(path)
 
-    def load(self, xmldata):
-        from .load import LoadState
-        ''' Maps 'xmldata' into objects as defined by the templates '''
-        state = LoadState(self)
-        cls, paths = decl.target(self.root)
-        if all(len(x) == 1 for x in paths):
-            cls = Singleton
-        root_target = state.add_target((cls, paths), 'root', )
+    def template_for(self, tag):
+        '''
+            Get the namespace and template of elements with the clark notation
+            `tag`. The namespace is taken from the tag itself, so no namespace
+            declarations of the document are involved.
+        '''
+        try:
+            return self._tags[tag]
+        except KeyError:
+            from .plan import split
+            namespace = split(tag)[0]
+            found = (namespace, self.get_template(namespace, [tag]))
+            self._tags[tag] = found
+            return found
 
+    def plan(self, template):
+        ''' Get the `TemplatePlan` describing the data collected for template '''
         try:
-            for event, element in etree.iterparse(xmldata, events=('start', 'end')):
-                if event == 'start':
-                    state.push(element)
-                elif event == 'end':
-                    state.pop(element)
-                    element.clear()
-                else:  # pragma: no cover
-                    assert False
-        # lxml bug workaround
-        except etree.XMLSyntaxError as e:
-            if e.text is not None:
-                raise e
-
-        if state.path != []:
-            raise Exception("Unexpected end of xml stream")
-
-        return root_target.get()
-
-    def dump(self, obj):
-        ''' Maps 'obj' into a xml as defined by the templates '''
-        from .dump import DumpState
-        state = DumpState(self)
-        cls, paths = decl.target(self.root)
-        if '/' not in self.root:
-            cls = Singleton
-        target = state.add_target((cls, paths), 'root')
-        target.set(obj)
-
-        stack = []
-        for event, element in state.dump():
-            if event == 'start':
-                if stack:
-                    stack[-1].append(element)
-                else:
-                    tree = etree.ElementTree(element)
-                stack.append(element)
-            elif event == 'end':
-                element = stack.pop()
-            else:
-                assert False
+            return self._plans[template]
+        except KeyError:
+            from .core import TemplatePlan
+            plan = self._plans[template] = TemplatePlan(template)
+            return plan
+
+    def compile(self):
+        '''
+            Resolve the plans of all templates and the states used to load
+            documents up front rather than when first needed by `load`.
+        '''
+        for ns in self.ns.values():
+            for tmpl in ns._templates.values():
+                self.plan(tmpl)
+        self.machine().compile()
+        return self
+
+    def machine(self, root=None):
+        '''
+            Get the compiled states used to load documents with objects
+            mapped from `root`, by default the root of this instance.
+        '''
+        from .plan import Machine
+        if root is None:
+            root = self.root
+        key = decl.hashable(root)
+        try:
+            return self._machines[key]
+        except KeyError:
+            cls, paths = decl.target(root)
+            if all(len(x) == 1 for x in paths):
+                cls = Singleton
+            machine = self._machines[key] = Machine(self, (cls, paths))
+            return machine
+
+    def load(self, xmldata, bounded=False, lenient=False, stats=None,
+             stop_when_complete=False, ids=True):
+        '''
+            Maps 'xmldata' into objects as defined by the templates
+
+            `xmldata` is a file name or path, read by libxml2 itself, a
+            file-like object, including `mmap`, or the document as `bytes`,
+            `bytearray` or `memoryview`, read without copying it whole.
+            gzip, bzip2 and xz compressed data is decompressed as it is
+            parsed.
+
+            When `bounded` is set elements are dropped from the parsed tree
+            as soon as they are processed to keep memory use flat.
+
+            When `lenient` is set elements not mapped by any template are
+            ignored along with their children instead of raising.
+
+            `stats` enables profiling of the load, either a `omx.stats.Stats`
+            instance to record to or a callback called with the `Stats` of
+            the load when done.
+
+            When `stop_when_complete` is set reading stops as soon as no
+            further part of the document can add to the objects, such as
+            after the header of `header[0]` when nothing else is mapped.
+
+            `ids` limits the objects kept by the `id` of their element for
+            `idref` targets and `context()`. By default every object is
+            kept. Otherwise only those referenced before their element ends
+            are, along with those whose id is in `ids` if it is a container.
+        '''
+        from .load import LoadState
+        if stats is not None:
+            from .stats import ProfiledLoadState, profile
+            with profile(stats) as stats:
+                state = ProfiledLoadState(self, self.machine(), lenient, stats,
+                                          stop_when_complete, ids)
+                return self._load(state, xmldata, bounded)
+        state = LoadState(self, self.machine(), lenient, stop_when_complete,
+                          ids)
+        return self._load(state, xmldata, bounded)
+
+    def _load(self, state, xmldata, bounded):
+        for _ in self.engine(state, xmldata, bounded=bounded):
+            pass
+        return state.root.get()
+
+    def iterload(self, xmldata, path=None, bounded=False, lenient=False,
+                 stop_when_complete=False, ids=True):
+        '''
+            Maps 'xmldata' into objects like `load` but yields the objects
+            mapped by `path`, by default the root, as soon as each is
+            completed instead of collecting them all.
+        '''
+        from .load import LoadState
+        state = LoadState(self, self.machine(path), lenient,
+                          stop_when_complete, ids)
+        return self.engine(state, xmldata, stream=True, bounded=bounded)
+
+    def loader(self, path=None, lenient=False, stop_when_complete=False,
+               ids=True):
+        '''
+            Get a `Loader` mapping a document fed to it in chunks with
+            `feed` into the objects mapped by `path`, by default the root.
+
+            The objects completed so far are returned by `collect` and the
+            rest by `close` at the end of the document. The parser target
+            interface is always used regardless of the engine.
+        '''
+        from .load import LoadState, Loader
+        return Loader(LoadState(self, self.machine(path), lenient,
+                                stop_when_complete, ids))
+
+    def aload(self, stream, lenient=False, stop_when_complete=False,
+              size=65536, budget=0.005):
+        '''
+            Coroutine mapping the document read from `stream` into objects
+            like `load`. `stream` is a `asyncio.StreamReader`, or any object
+            with a `read` coroutine, or a async iterator of bytes.
+
+            The data is read and parsed in chunks of `size` bytes, letting
+            other tasks run whenever parsing has used `budget` seconds.
+        '''
+        from .aio import aload
+        return aload(self, stream, lenient, stop_when_complete, size, budget)
+
+    def aiterload(self, stream, path=None, lenient=False,
+                  stop_when_complete=False, size=65536, budget=0.005):
+        '''
+            Async iterator of the objects mapped by `path` from the document
+            read from `stream`, like `iterload` but reading as `aload`.
+        '''
+        from .aio import aiterload
+        return aiterload(self, stream, path, lenient, stop_when_complete,
+                         size, budget)
+
+    def load_many(self, sources, workers=None, chunksize=1, ordered=True,
+                  **kwargs):
+        '''
+            Maps each of `sources`, file names or bytes, into objects like
+            `load` spread over a pool of `workers` processes.
+
+            This instance is sent to each worker once, which requires its
+            templates to be picklable. Templates created by decorating module
+            level functions are sent as references to their module.
+
+            Sources are sent to the workers `chunksize` at a time. With
+            `ordered` the results are yielded in the order of `sources`,
+            otherwise (index, result) pairs are yielded as chunks complete. An
+            exception raised loading a source is yielded in place of its
+            result, as is one for a result that can not be pickled. Any
+            other keyword arguments are passed to `load`.
+        '''
+        from .batch import load_many
+        return load_many(self, sources, workers, chunksize, ordered, kwargs)
+
+    def dump(self, obj, stats=None):
+        '''
+            Maps 'obj' into a xml as defined by the templates
+
+            `stats` enables profiling like for `load`
+        '''
+        from .dump import build
+        if stats is not None:
+            from .stats import profile
+            with profile(stats) as stats:
+                return build(self._dumpstate(obj, stats))
+        return build(self._dumpstate(obj))
+
+    def _dumpstate(self, obj, stats=None):
+        if stats is None:
+            from .dump import DumpState
+            state = DumpState(self)
+        else:
+            from .stats import ProfiledDumpState
+            state = ProfiledDumpState(self, stats)
+        state.add_root(obj)
+        return state
+
+    def dump_to(self, obj, fileobj, encoding='utf-8', workers=None,
+                chunksize=1000, stats=None):
+        '''
+            Maps 'obj' into xml like `dump` but writes it to `fileobj` as it is
+            produced instead of building the whole tree.
+
+            When `workers` is given and the root is a path to repeated
+            elements the objects are split in chunks of `chunksize` that are
+            serialised in a pool of `workers` processes, see `load_many` for
+            the requirements on the templates.
 
-        return tree
+            `stats` enables profiling like for `load`, it is not supported
+            together with `workers` and raises `ValueError`.
+        '''
+        from .dump import write
+        if workers is not None:
+            if stats is not None:
+                raise ValueError('stats is not supported with workers')
+            from .batch import dump_to
+            if dump_to(self, obj, fileobj, encoding, workers, chunksize):
+                return
+        if stats is not None:
+            from .stats import profile
+            with profile(stats) as stats:
+                with etree.xmlfile(fileobj, encoding=encoding) as xf:
+                    write(self._dumpstate(obj, stats), xf)
+            return
+        with etree.xmlfile(fileobj, encoding=encoding) as xf:
+            write(self._dumpstate(obj), xf)
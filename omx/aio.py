@@ -0,0 +1,65 @@
+# vim: ts=4:sw=4:
+'''
+    Loading from asyncio streams, see `OMX.aload` and `OMX.aiterload`
+
+    The data is fed to a `Loader` in slices, handing control back to the
+    event loop whenever parsing has used up the CPU budget so other tasks
+    keep running while large documents are loaded.
+'''
+
+import asyncio
+from timeit import default_timer as clock
+
+
+async def chunks(stream, size):
+    '''
+        Iterate the chunks of `stream`, a object with a `read` coroutine like
+        `asyncio.StreamReader` or a async iterator of bytes
+    '''
+    if hasattr(stream, 'read'):
+        while True:
+            chunk = await stream.read(size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        async for chunk in stream:
+            yield chunk
+
+
+async def feed(loader, stream, size, budget):
+    '''
+        Feed `stream` to `loader` in slices of at most `size` bytes,
+        yielding after each slice. Control is handed back to the event loop
+        once parsing has run for `budget` seconds since it last was.
+    '''
+    start = clock()
+    async for chunk in chunks(stream, size):
+        for offset in range(0, len(chunk), size):
+            loader.feed(chunk[offset:offset + size])
+            yield
+            if clock() - start >= budget:
+                await asyncio.sleep(0)
+                start = clock()
+        if loader.complete:
+            return
+
+
+async def aiterload(omx, stream, path, lenient, stop_when_complete, size,
+                    budget):
+    loader = omx.loader(path, lenient, stop_when_complete)
+    async for _ in feed(loader, stream, size, budget):
+        for obj in loader.collect():
+            yield obj
+    for obj in loader.close():
+        yield obj
+
+
+async def aload(omx, stream, lenient, stop_when_complete, size, budget):
+    loader = omx.loader(None, lenient, stop_when_complete)
+    async for _ in feed(loader, stream, size, budget):
+        pass
+    objs = loader.close()
+    if loader.state.root.singleton:
+        return objs[0] if objs else None
+    return objs
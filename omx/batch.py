@@ -0,0 +1,174 @@
+# vim: ts=4:sw=4:
+'''
+    Loading of many documents in a pool of processes
+
+    Loading of many documents and dumping of large collections in a pool of
+    processes
+
+    The functions run in the workers are module level so they can be found
+    by the pool, and the `OMX` instance is installed in each worker once by
+    `initialise`.
+'''
+
+import collections
+import itertools
+import os
+import pickle
+from lxml import etree
+from . import decl
+from .target import Target
+
+# The OMX instance of a worker process
+worker = None
+
+
+def initialise(omx, kwargs):
+    global worker
+    worker = (omx, kwargs)
+
+
+def load(source):
+    omx, kwargs = worker
+    try:
+        result = omx.load(source, **kwargs)
+    except Exception as e:
+        # The exception is sent back in place of the result
+        result = e
+    return sendable(result)
+
+
+def sendable(result):
+    '''
+        `result` if it can be sent back from the worker, otherwise a
+        exception describing why not
+    '''
+    try:
+        pickle.dumps(result)
+    except Exception as e:
+        if isinstance(result, Exception):
+            return Exception(repr(result))
+        return Exception('result can not be pickled: %r' % (e,))
+    return result
+
+
+def load_chunk(offset, chunk):
+    return offset, [load(source) for source in chunk]
+
+
+def chunks(sources, size):
+    sources = iter(sources)
+    offset = 0
+    while True:
+        chunk = list(itertools.islice(sources, size))
+        if not chunk:
+            return
+        yield offset, chunk
+        offset += len(chunk)
+
+
+def load_many(omx, sources, workers, chunksize, ordered, kwargs):
+    ''' See `OMX.load_many` '''
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor(workers, initializer=initialise,
+                                   initargs=(omx, kwargs))
+    # Keep a bounded number of chunks in flight like `dump_to`
+    limit = 2 * (workers or os.cpu_count() or 1)
+    with executor:
+        pending = collections.deque() if ordered else set()
+        for offset, chunk in chunks(sources, chunksize):
+            future = executor.submit(load_chunk, offset, chunk)
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+            while len(pending) > limit:
+                for result in collect(pending, ordered):
+                    yield result
+        while pending:
+            for result in collect(pending, ordered):
+                yield result
+
+
+def collect(pending, ordered):
+    '''
+        Remove the next chunk of `pending` futures when `ordered`, otherwise
+        any completed, and return their results
+    '''
+    from concurrent.futures import wait, FIRST_COMPLETED
+
+    if ordered:
+        done = [pending.popleft()]
+    else:
+        done = wait(pending, return_when=FIRST_COMPLETED).done
+        pending.difference_update(done)
+
+    results = []
+    for future in done:
+        offset, chunk = future.result()
+        for index, result in enumerate(chunk, offset):
+            results.append(result if ordered else (index, result))
+    return results
+
+
+def dump_chunk(tag, chunk, encoding):
+    ''' Serialise the objects of `chunk` as a sequence of `tag` elements '''
+    from .dump import DumpState, elements
+    omx, kwargs = worker
+    state = DumpState(omx)
+    state.add_root(chunk, (Target, [[tag]]))
+    return b''.join(etree.tostring(element, encoding=encoding,
+                                   xml_declaration=False)
+                    for element in elements(state))
+
+
+def wrapper(tags, encoding):
+    '''
+        The serialised start and end tags of nested elements `tags`, and the
+        elements serialised without content
+    '''
+    root = parent = etree.Element(tags[0])
+    for tag in tags[1:]:
+        parent = etree.SubElement(parent, tag)
+    empty = etree.tostring(root, encoding=encoding, xml_declaration=False)
+    parent.append(etree.Comment('omx'))
+    data = etree.tostring(root, encoding=encoding, xml_declaration=False)
+    marker = etree.tostring(etree.Comment('omx'), encoding=encoding)
+    head, tail = data.split(marker)
+    return head, tail, empty
+
+
+def dump_to(omx, obj, fileobj, encoding, workers, chunksize):
+    '''
+        See `OMX.dump_to`, returns False without writing anything when the
+        root of `omx` is not a single path to repeated elements, such as a
+        path ending in a attribute or text.
+    '''
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    cls, paths = decl.target(omx.root)
+    if len(paths) != 1 or len(paths[0]) < 2 or decl.pseudo(paths[0][-1]):
+        return False
+    tags = [decl.window(step)[0] for step in paths[0]]
+    head, tail, empty = wrapper(tags[:-1], encoding)
+
+    executor = ProcessPoolExecutor(workers, initializer=initialise,
+                                   initargs=(omx, {}))
+    with executor:
+        # Keep a bounded number of chunks in flight, written in order
+        pending = collections.deque()
+        written = False
+        for offset, chunk in chunks(obj, chunksize):
+            if not written:
+                fileobj.write(head)
+                written = True
+            pending.append(executor.submit(dump_chunk, tags[-1], chunk,
+                                           encoding))
+            if len(pending) > 2 * workers:
+                fileobj.write(pending.popleft().result())
+        while pending:
+            fileobj.write(pending.popleft().result())
+        fileobj.write(tail if written else empty)
+    return True
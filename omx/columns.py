@@ -0,0 +1,104 @@
+# vim: ts=4:sw=4:
+'''
+    Columnar targets collecting repeated values into arrays
+
+    A table of rows is loaded column by column by mapping the fields of the
+    rows from the template of the table itself, so no object is created per
+    row
+
+        @template('table', (), {
+            column('l', 'row/@id'): 'ids',
+            column('d', 'row/string()'): 'values',
+        })
+        def table(ids, values):
+            return ids, values
+
+    `column` collects into a `array.array`, which can be shared with numpy
+    without a copy through `numpy.frombuffer`. `ndcolumn` collects directly
+    into a numpy array and requires numpy to be installed.
+'''
+
+from array import array
+from .target import Target, variant
+from .convert import boolean, conversions
+
+# The conversion of the strings of each array typecode
+typecodes = dict(
+    [(code, int) for code in 'bBhHiIlLqQ'] +
+    [(code, float) for code in 'fd'])
+
+
+class Column(Target):
+    '''
+        Collects the values of a target into a `array.array`, converting
+        each value as it is added so no strings are kept
+    '''
+
+    __slots__ = ()
+
+    # Set by the subclasses of `column` and `ndcolumn`
+    typecode = None
+    convert = None
+
+    def __init__(self, name, pattern=None):
+        Target.__init__(self, name, pattern)
+        self._data = array(self.typecode)
+
+    def add(self, value):
+        self._data.append(self.convert(value))
+
+
+def column(typecode, path):
+    '''
+        A target declaration collecting the values of `path` to a
+        `array.array` of the numeric `typecode`
+    '''
+    return arraytype(typecode), path
+
+
+def arraytype(typecode):
+    ''' The target class of `column` '''
+    try:
+        convert = typecodes[typecode]
+    except KeyError:
+        raise ValueError('unsupported typecode %r' % (typecode,))
+
+    format = repr if convert is float else str
+    return variant(Column, ('array', typecode), None, format,
+                   (arraytype, (typecode,)),
+                   typecode=typecode, convert=staticmethod(convert))
+
+
+def ndcolumn(dtype, path):
+    '''
+        A target declaration collecting the values of `path` to a numpy
+        array of `dtype`. Booleans and numbers of the sizes of a array
+        typecode are collected to a `array.array` shared by the numpy array,
+        other types to a list.
+    '''
+    return ndtype(dtype), path
+
+
+def ndtype(dtype):
+    ''' The target class of `ndcolumn` '''
+    import numpy
+    dtype = numpy.dtype(dtype)
+    native = dtype.newbyteorder('=')
+    rebuild = (ndtype, (dtype,))
+
+    format = str
+    if dtype.kind == 'b':
+        typecode, convert = 'b', boolean
+        format = conversions['bool'][1]
+    elif native.char in typecodes and dtype.kind in 'iuf':
+        typecode, convert = native.char, typecodes[native.char]
+    else:
+        def finish(values):
+            return numpy.array(values, dtype=dtype)
+        return variant(Target, ('ndarray', dtype), finish, str, rebuild)
+
+    def finish(values):
+        return numpy.frombuffer(values, native).astype(dtype, copy=False)
+
+    return variant(Column, ('ndarray', dtype), finish, format, rebuild,
+                   typecode=typecode, convert=staticmethod(convert))
@@ -0,0 +1,62 @@
+# vim: ts=4:sw=4:
+'''
+    Conversions of the strings collected from attributes and text
+
+    A conversion is a pair of functions, `convert` turning the collected
+    string into a value when loading and `format` turning the value back into
+    a string when dumping. Targets are declared with a conversion either by
+    name at the end of the path, as in `'data/@count:int'`, or by type as in
+    `(int, 'data/@count')`.
+'''
+
+from datetime import datetime
+from decimal import Decimal
+from .target import typed
+
+
+def boolean(value):
+    ''' Parse a xml schema boolean '''
+    if value in ('true', '1'):
+        return True
+    if value in ('false', '0'):
+        return False
+    raise ValueError('invalid boolean %r' % (value,))
+
+
+def isodatetime(value):
+    ''' Parse a ISO 8601 date and time such as 2016-01-02T03:04:05Z '''
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+
+conversions = {
+    'int': (int, str),
+    'float': (float, repr),
+    'bool': (boolean, lambda value: 'true' if value else 'false'),
+    'decimal': (Decimal, str),
+    'datetime': (isodatetime, datetime.isoformat),
+}
+
+# The conversions used when declared by type
+types = {
+    int: conversions['int'],
+    float: conversions['float'],
+    bool: conversions['bool'],
+    Decimal: conversions['decimal'],
+    datetime: conversions['datetime'],
+}
+
+
+def conversion(kind):
+    ''' Get the (convert, format) pair of `kind`, a name or type '''
+    try:
+        return conversions[kind] if isinstance(kind, str) else types[kind]
+    except KeyError:
+        raise ValueError('unknown conversion %r' % (kind,))
+
+
+def converted(base, kind):
+    ''' Get the subclass of the target class `base` converting to `kind` '''
+    convert, format = conversion(kind)
+    return typed(base, convert, format, (converted, (base, kind)))
@@ -1,250 +1,174 @@
 # vim: ts=4:sw=4:
 
-import itertools
-from .target import Target
+from .target import plain
 
 
-class TemplateData(object):
+class TemplatePlan(object):
     '''
-        Collects the data need to create a object as defined by 'template'
-        When created registers targets for sub-objects with the OMXState.
-
-        `template` is the template that data is collected for
-        `values` is a list of Target instances for all sub-objects
+        The layout of the data collected for `template`, resolved once and
+        shared by every `TemplateData` of the template.
+
+        `targets` is a tuple of (cls, name, pattern) for each target,
+        `positional` the indices and singleton flags of the targets passed
+        as positional arguments to the factory and `keyword` the indices,
+        names and singleton flags of those passed as keyword arguments.
+
+        When `compact` is set the values of targets of exactly `Target` or
+        `Singleton`, or their typed variants, are collected in plain lists
+        instead of `Target` instances. `finish` holds the function applied to
+        the values of each target when creating the object, or None.
     '''
-    ## TODO
-    # add method to verify values are of the proper type ?
 
-    def __init__(self, template, state):
-        '''
-            `template` a `Template` describing what data should be collected
-            `state` a `OmxState` object
-        '''
+    def __init__(self, template, compact=True):
+        from .plan import tree
 
         self.template = template
-        add = state.add_target
-        self.values = [add(path, name) for (path, name) in template.targets]
+        self.targets = tuple(
+            (cls, name, '|'.join(['/'.join(x) for x in paths]))
+            for (cls, paths), name in template.targets
+        )
+        self.positional = tuple(
+            (i, getattr(cls, 'singleton', False))
+            for i, (cls, name, pattern) in enumerate(self.targets)
+            if name is None
+        )
+        self.keyword = tuple(
+            (i, name, getattr(cls, 'singleton', False))
+            for i, (cls, name, pattern) in enumerate(self.targets)
+            if name is not None
+        )
+        # The targets needing a instance, None for the plain lists
+        self.handles = tuple(
+            None if compact and plain(cls) else (cls, name, pattern)
+            for cls, name, pattern in self.targets
+        )
+        self.finish = tuple(
+            getattr(cls, 'finish', None)
+            for cls, name, pattern in self.targets
+        )
+        self.tree = tree(template.targets)
+        # The `omx.dump.Step` of tree, compiled when first dumped
+        self.steps = None
 
     def __repr__(self):
-        return '<TemplateData of %r>' % self.template
+        return '<TemplatePlan of %r>' % self.template
 
-    def create(self):
+    def data(self, cls=None, handles=False):
         '''
-            Creates a new object by calling the factory of the Template with
-            the values stored
+            Create a new `TemplateData`, or instance of the subclass `cls`,
+            with empty targets. With `handles` every target is a `Target`
+            instance even in a compact plan, as needed when dumping.
         '''
+        if cls is None:
+            cls = TemplateData
+        data = cls.__new__(cls)
+        data.template = self.template
+        data.plan = self
+        values = data.values = []
+        for handle, target in zip(self.handles, self.targets):
+            if handle is None:
+                if not handles:
+                    values.append([])
+                    continue
+                handle = target
+            tcls, name, pattern = handle
+            handle = tcls(name)
+            handle.pattern = pattern
+            values.append(handle)
+        return data
+
+
+# Returned by `argument` for a empty singleton target
+missing = object()
+
+
+def argument(value, singleton, finish):
+    '''
+        The argument collected by `value`, either a plain list or a `Target`
+        instance, or `missing` for a empty singleton target. The argument is
+        passed through `finish` unless it is None.
+    '''
+    if value.__class__ is list:
+        if singleton:
+            if not value:
+                return missing
+            if len(value) > 1:
+                raise Exception("Value already set for singleton target")
+            value = value[0]
+    elif singleton and value.empty:
+        return missing
+    else:
+        value = value.get()
 
-        # Build positonal and keyword -arguments
-        args = []
-        kwargs = {}
-        for t in self.values:
-            if t.name is None:
-                if t.singleton and t.empty:
-                    raise Exception(
-                        "Missing argument (arg %d to %s)" %
-                        (len(args) + 1, self.template.match)
-                    )
-                args.append(t.get())
-            else:
-                if not t.empty or not t.singleton:
-                    kwargs[t.name] = t.get()
-
-        # Create object
-        return self.template._factory(*args, **kwargs)
-
-    def dump(self, obj):
-        def values(*args, **kwargs):
-            args = list(args)
-            args.reverse()
-            for t in self.values:
-                try:
-                    if t.name is None:
-                        value = args.pop()
-                    else:
-                        value = kwargs[t.name]
-                except (IndexError, KeyError) as e:
-                    raise KeyError('No value given for %r' % t)
-                t.set(value)
-        self.template._serialiser(values, obj)
-
-
-class TargetDir(object):
-    fill = object()
-
-    def __init__(self):
-        self.__targets = {}
-
-    def __query(self, path, onaction=None):
-        parent = None
-        target = None
-        current = self.__targets
-        for p in path:
-            parent = current
-            try:
-                (current, target) = current[p]
-            except KeyError:
-                if onaction is self.fill:
-                    tmp = ({}, None)
-                    current[p] = tmp
-                    (current, target) = tmp
-                else:
-                    raise
-        return parent, current, target
-
-    def __dfs(self, val, pre, ctx):
-        for i, (child_ctx,t) in ctx.items():
-            p = (pre + (i,))
-            if t is not None:
-                yield val(p, t)
-            for x in self.__dfs(val, p, child_ctx):
-                yield x
-
-    def get(self, path):
-        if not isinstance(path, (tuple, list)):
-            raise TypeError("path not a tuple: %r" % path)
-        parent, current, target = self.__query(path)
-        return target
-
-    def add(self, path, target):
-        if not isinstance(path, (tuple, list)):
-            raise TypeError("path not a tuple: %r" % path)
-        parent, current, old = self.__query(path, self.fill)
-        if old is not None:
-            raise Exception('Path [%r] already claimed by %r' % (path, old))
-        parent[path[-1]] = (current, target)
-        return target
-
-    def remove(self, path):
-        if not isinstance(path, (tuple, list)):
-            raise TypeError("path not a tuple: %r" % path)
-        parent, current, target = self.__query(path)
-        if len(current) > 0:
-            raise Exception('sub-tree not empty')
-        del parent[path[-1]]
-
-    def emptytree(self, path):
-        if not isinstance(path, (tuple, list)):
-            raise TypeError("path not a tuple: %r" % path)
-        parent, current, target = self.__query(path)
-        current.clear()
-
-    def children(self, path):
-        if not isinstance(path, (tuple, list)):
-            raise TypeError("path not a tuple: %r" % path)
-        parent, current, target = self.__query(path)
-        for key, (g, child) in list(current.items()):
-            yield (tuple(path) + (key,), child)
-
-    def keys(self):
-        return self.__dfs((lambda p, t: p), (), self.__targets)
-
-    def values(self):
-        return self.__dfs((lambda p, t: t), (), self.__targets)
-
-    def items(self):
-        return self.__dfs((lambda p, t: (p, t)), (), self.__targets)
-
-    @property
-    def empty(self):
-        return len(self.__targets) == 0
-
-
-def traverse(dir):
-    def psuedoelement(p):
-        t = p[0][-1]
-        return t.startswith('@') or t.endswith('()')
-
-    path = ()
-    while True:
-        try:
-            v = dir.get(path)
-        except KeyError:
-            path = path[:-1]
-            continue
-        children = dir.children(path)
-        try:
-            path, v = next(itertools.dropwhile(psuedoelement, children))
-        except StopIteration:
-            if v is None and path == ():
-                return
-        yield path, v
-
-
-class OMXState(object):
-    def __init__(self, omx):
-        self.omx = omx
-        self.path = []
-        self.__targets = TargetDir()
-
-    def add_target(self, target, name):
-        '''
-            Registers elements of `target` relative the current path to be saved
-            in new Target named `name`.
-
-            Returns the new `Target` instance.
-        '''
+    return value if finish is None else finish(value)
 
-        # combine path(s) with current path and detect if the path
-        # should be marked as a singleton target
-        cls, paths = target
-        paths = [tuple((self.path or []) + p) for p in paths]
 
-        # Create handle
-        handle = cls(name)
-        handle.pattern = '|'.join(['/'.join(x) for x in paths])
+class TemplateData(object):
+    '''
+        Collects the data need to create a object as defined by 'template'
+        Created by `TemplatePlan.data` with empty targets.
 
-        for path in paths:
-            self.__targets.add(path, handle)
+        `template` is the template that data is collected for
+        `values` holds the data of each target, `Target` instances or the
+        plain lists of a compact `TemplatePlan`
+    '''
+    ## TODO
+    # add method to verify values are of the proper type ?
 
-        return handle
+    # `plan` is the TemplatePlan of template
+    __slots__ = ('template', 'plan', 'values')
 
-    def has_target(self):
-        return not self.__targets.empty
+    def __repr__(self):
+        return '<TemplateData of %r>' % self.template
 
-    def get_target(self, path=None):
+    def create(self):
         '''
-            Get the `Target` instance registered for `path` or the current path
-            if None.
-
-            Raises `KeyError` if no `Target` is registered for the path.
+            Creates a new object by calling the factory of the Template with
+            the values stored
         '''
+        args, kwargs = self.arguments()
+        return self.template._factory(*args, **kwargs)
 
-        if path is None:
-            path = self.path
-
-        return self.__targets.get(path)
-
-    def remove_target(self, path=None):
-        if path is None:
-            path = self.path
-
-        return self.__targets.remove(path)
+    def arguments(self):
+        ''' The positional and keyword arguments of the factory '''
 
-    def prune_targets(self, path):
-        ''' Removes all targets registered below `path` '''
-        self.__targets.emptytree(path)
+        plan = self.plan
+        values = self.values
+        finish = plan.finish
 
-    def itertargets(self):
-        return traverse(self.__targets)
+        # Build positonal and keyword -arguments
+        args = []
+        for index, singleton in plan.positional:
+            value = argument(values[index], singleton, finish[index])
+            if value is missing:
+                raise Exception(
+                    "Missing argument (arg %d to %s)" %
+                    (len(args) + 1, self.template.match)
+                )
+            args.append(value)
 
-    def children(self, path=None):
-        if path is None:
-            path = self.path
+        kwargs = {}
+        for index, name, singleton in plan.keyword:
+            value = argument(values[index], singleton, finish[index])
+            if value is not missing:
+                kwargs[name] = value
 
-        return self.__targets.children(path)
+        return args, kwargs
 
-    def get_attributes(self, path=None):
-        for ap, at in self.children(path):
-            if ap[-1][0] == '@':
-                v = at.pop()
-                if at.empty:
-                    self.__targets.remove(ap)
-                yield ap[-1][1:], str(v)
+    def dump(self, obj):
+        ''' Set the values of the targets from `obj` with the serialiser '''
+        self.template._serialiser(self.assign, obj)
 
-    def get_text(self, path=None):
-        for ap, at in self.children(path):
-            if ap[-1] == 'text()':
-                v = at.pop()
-                if at.empty:
-                    self.__targets.remove(ap)
-                return v
+    def assign(self, *args, **kwargs):
+        ''' Called by the serialiser with the values of the targets '''
+        args = list(args)
+        args.reverse()
+        for t in self.values:
+            try:
+                if t.name is None:
+                    value = args.pop()
+                else:
+                    value = kwargs[t.name]
+            except (IndexError, KeyError):
+                raise KeyError('No value given for %r' % t)
+            t.set(value)
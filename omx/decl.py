@@ -7,6 +7,8 @@
 
 import re
 from .target import Target, Singleton
+from .convert import conversions, types, converted
+from . import ref
 
 try:
     unicode
@@ -17,11 +19,36 @@ except NameError:
 pathsplit = re.compile('(?:[^/\{]+)|(?:\{[^\}]*\}[^/]*)').findall
 
 
+_predicate = re.compile(r'(.*)\[(\d*)(:?)(\d*)\]$').match
+
+
+def window(step):
+    '''
+        Split a step like `item[2]` or `item[:10]` into the tag and the
+        (start, stop) positions matched by its predicate, stop being None
+        when open ended. The window is None for steps without predicate.
+    '''
+    match = _predicate(step)
+    if match is None:
+        return step, None
+    tag, start, colon, stop = match.groups()
+    if not colon:
+        if not start:
+            raise ValueError('empty predicate in %r' % (step,))
+        start = int(start)
+        return tag, (start, start + 1)
+    return tag, (int(start or 0), int(stop) if stop else None)
+
+
 def _expandns(path, references):
     if path.startswith('{'):
         return path
     if path.endswith('()'):
         return path
+    if path.endswith(']'):
+        # Keep the colon of a range predicate out of the namespace lookup
+        path, bracket, predicate = path.partition('[')
+        return _expandns(path, references) + bracket + predicate
     attrib = path.startswith('@')
     prefix = '@' if attrib else ''
     parts = path[1 if attrib else 0:].split(':', 1)
@@ -45,26 +72,84 @@ def path(pstr, references=None):
 
 
 def target(tstr, references=None):
+    '''
+        Parse a target declaration into a pair of `Target` class and paths
+
+        A declaration is a string of paths separated by `|`, optionally
+        paired with a class as `(cls, paths)`. Instead of a class the pair
+        may give the type the values are converted to, as in
+        `(int, 'data/@count')`, or the name of the type may end the string,
+        as in `'data/@count:int'`, see `omx.convert`. Attributes ending
+        with `:idref` or `:idrefs` are references to other elements, see
+        `omx.ref`. The name is only read as a conversion after a attribute,
+        `string()` or `normalize-space()`, so `'x:int'` is a element.
+    '''
     cls = None
+    kind = None
+    refkind = None
 
     if isinstance(tstr, tuple) and len(tstr) == 2:
         cls, tstr = tstr
+        if cls in types:
+            kind, cls = cls, None
 
     if isinstance(tstr, strings):
+        head, sep, name = tstr.rpartition(':')
+        if sep and converts(head.rsplit('/', 1)[-1]):
+            if name in conversions:
+                kind, tstr = name, head
+            elif name in ref.kinds:
+                refkind, tstr = name, head
         tstr = tstr.split('|')
 
     paths = [path(p, references) for p in tstr]
 
+    if refkind is not None and not all(p and p[-1][:1] == '@' for p in paths):
+        raise ValueError('%s target %r is not a attribute' % (refkind, tstr))
+
     if cls is None:
         cls = Singleton if singleton(paths) else Target
 
+    if kind is not None:
+        cls = converted(cls, kind)
+    elif refkind is not None:
+        cls = ref.reference(cls, refkind)
+
     return (cls, paths)
 
 
+def converts(step):
+    ''' True if the value of `step` is a string that may be converted '''
+    return step[:1] == '@' or step in ('string()', 'normalize-space()')
+
+
+def pseudo(step):
+    return step[0] == '@' or step.endswith('()')
+
+
 def singleton(paths):
+    '''
+        True if `paths` match at most one value, being a single attribute
+        or text of the element or going through elements selected by a
+        single position like `item[0]`
+    '''
     if len(paths) > 1:
         return False
     path, = paths
-    if len(path) > 1:
-        return False
-    return path[-1][0] == '@' or path[-1].endswith('()')
+    if len(path) == 1 and pseudo(path[0]):
+        return True
+    for step in path:
+        if pseudo(step):
+            continue
+        # A index and not a range like [:1]
+        match = _predicate(step)
+        if match is None or match.group(3):
+            return False
+    return True
+
+
+def hashable(tstr):
+    ''' Convert a target declaration into a form usable as a key '''
+    if isinstance(tstr, (list, tuple)):
+        return tuple(hashable(x) for x in tstr)
+    return tstr
@@ -1,57 +1,272 @@
 # vim: ts=4:sw=4:
 
 from lxml import etree
-from .core import OMXState, TemplateData
-from .template import TemplateHint
+from . import decl
+from .core import TemplateData, TemplatePlan
+from .target import Singleton
+from .template import Template, TemplateHint
 
 
-class DumpState(OMXState):
+class Step(object):
+    '''
+        The elements written for a step of the paths of a template, compiled
+        once from the `Node` of the step.
+
+        `attributes` holds (name, index) pairs and `text` and `slot` are
+        target indices or None, like in the `Node`. `children` is the
+        (tag, Step) of each child in order of declaration.
+
+        `indices` holds the targets at or below the step, an element is only
+        written for a step without slot if any of them has values, or if the
+        step is `required` like the wrapper elements of the root path.
+        `repeat` holds the attribute and text targets among them, the
+        element is written again as long as they have values left.
+    '''
+
+    __slots__ = ('attributes', 'text', 'slot', 'children', 'indices',
+                 'repeat', 'required')
+
+    def __init__(self, node):
+        self.attributes = tuple(node.attributes.items())
+        self.text = node.text
+        self.slot = node.slot
+        self.children = tuple(
+            (tag, Step(child)) for tag, child in node.children.items())
+
+        repeat = [index for name, index in self.attributes]
+        if self.text is not None:
+            repeat.append(self.text)
+        indices = list(repeat)
+        if self.slot is not None:
+            indices.append(self.slot)
+        for tag, child in self.children:
+            repeat.extend(child.repeat)
+            indices.extend(child.indices)
+        self.repeat = tuple(repeat)
+        self.indices = tuple(indices)
+        self.required = False
+
+
+def steps(plan):
+    ''' Get the compiled `Step` of the tree of `plan` '''
+    if plan.steps is None:
+        plan.steps = Step(plan.tree)
+    return plan.steps
+
+
+def pending(parts, attr):
+    ''' True if any of the targets named by `attr` of `parts` has values '''
+    for step, values in parts:
+        for index in getattr(step, attr):
+            if not values[index].empty:
+                return True
+    return False
+
+
+def drain(target):
+    '''
+        Pop the values of `target` in order. Custom targets may end early
+        by raising `StopIteration` from `pop`, like a iterator.
+    '''
+    while not target.empty:
+        try:
+            value = target.pop()
+        except StopIteration:
+            return
+        yield value
+
+
+class DumpState(object):
+    '''
+        Produces the events of the elements serialised from a object
+
+        The elements are written in a single pass over the compiled `Step`s
+        of the templates. Every element is written from a list of parts,
+        pairs of `Step` and target values of the templates sharing it.
+    '''
+
+    # The class collecting the values of each serialised object
+    datacls = TemplateData
+
     def __init__(self, omx):
-        OMXState.__init__(self, omx)
+        self.omx = omx
+        self.parts = []
+
+    def add_root(self, obj, target=None):
+        '''
+            Set `obj` as the value of `target`, by default the root path of
+            omx
+        '''
+        if target is None:
+            root = self.omx.root
+            cls, paths = decl.target(root)
+            if '/' not in root or all(len(x) == 1 for x in paths):
+                cls = Singleton
+            target = (cls, paths)
+        plan = TemplatePlan(Template(None, (target,)))
+        data = plan.data(handles=True)
+        data.values[0].set(obj)
+
+        # The wrapper elements are written even when there is nothing in them
+        root = steps(plan)
+        for path in target[1]:
+            step = root
+            for tag in path[:-1]:
+                step = dict(step.children)[decl.window(tag)[0]]
+                step.required = True
+        self.parts.append((root, data.values))
 
     def dump(self):
-        namespace = ''  # FIXME
-        for path, target in self.itertargets():
-            lpath = list(path)
-            repeat = lpath == self.path
-            self.path = lpath
-
-            if repeat:
-                yield 'end', path[-1]
-
-            # this could be refactored by merging the two main branches
-            if target is None:
-                if list(self.children(path)):
-                    attributes = dict(self.get_attributes(path))
-                    text = self.get_text(path)
-                    element = etree.Element(path[-1])
-                    element.attrib.update(attributes)
-                    element.text = text
-                    yield 'start', element
-                else:
-                    self.remove_target(path)
-                    self.path.pop()
+        ''' Yield ('start', element) and ('end', tag) events '''
+        return self.children(self.parts)
 
-            else:
-                if target.empty:
-                    self.remove_target(path)
-                    self.path.pop()
+    def tag(self, template, tags):
+        ''' The tag among `tags` using `template`, for hinted values '''
+        for tag in tags:
+            try:
+                if self.omx.template_for(tag)[1] is template:
+                    return tag
+            except KeyError:
+                pass
+        return template.match
+
+    def children(self, parts):
+        ''' Yield the events of the child elements of `parts` '''
+        tags = []
+        groups = {}
+        for step, values in parts:
+            for tag, child in step.children:
+                group = groups.get(tag)
+                if group is None:
+                    group = groups[tag] = []
+                    tags.append(tag)
+                group.append((child, values))
+
+        for tag in tags:
+            group = groups[tag]
+            slots = [values[child.slot] for child, values in group
+                     if child.slot is not None]
+
+            if not slots:
+                # Intermediate element, repeated for attribute values left
+                if not (pending(group, 'indices') or
+                        any(child.required for child, values in group)):
                     continue
+                for event in self.element(tag, group):
+                    yield event
+                while pending(group, 'repeat'):
+                    for event in self.element(tag, group):
+                        yield event
+                continue
+
+            for target in slots:
+                for value in drain(target):
+                    if isinstance(value, TemplateHint):
+                        template, value = value.template, value.obj
+                        name = self.tag(template, tags)
+                    else:
+                        template = self.omx.template_for(tag)[1]
+                        name = tag
+
+                    plan = self.omx.plan(template)
+                    data = plan.data(self.datacls, handles=True)
+                    data.dump(value)
+
+                    sub = group + [(steps(plan), data.values)]
+                    for event in self.element(name, sub):
+                        yield event
+
+            # Values in attributes and text of the elements no longer written
+            if pending(group, 'repeat'):
+                raise Exception("values left for '%s' after its elements" %
+                                (tag,))
+
+    def element(self, tag, parts):
+        ''' Yield the events of a `tag` element of `parts` '''
+        attrib = {}
+        text = None
+        for step, values in parts:
+            for name, index in step.attributes:
+                target = values[index]
+                if not target.empty:
+                    attrib[name] = str(target.pop())
+            if step.text is not None:
+                target = values[step.text]
+                if not target.empty:
+                    text = target.pop()
 
-                # Set up new template data
-                value = target.pop()
-                if isinstance(value, TemplateHint):
-                    template, value = value.template, value.obj
-                else:
-                    template = self.omx.get_template(namespace, path)
-
-                data = TemplateData(template, self)
-                data.dump(value)
-
-                # Create element
-                element = etree.Element(data.template.match)
-                attributes = dict(self.get_attributes(path))
-                text = self.get_text(path)
-                element.attrib.update(attributes)
-                element.text = text
-                yield 'start', element
+        element = etree.Element(tag, attrib)
+        element.text = text
+        yield 'start', element
+        for event in self.children(parts):
+            yield event
+        yield 'end', tag
+
+
+def elements(state):
+    ''' Yield each top level element built from the events of `state` '''
+    stack = []
+    for event, element in state.dump():
+        if event == 'start':
+            if stack:
+                stack[-1].append(element)
+            stack.append(element)
+        elif event == 'end':
+            element = stack.pop()
+            if not stack:
+                yield element
+        else:
+            assert False
+
+
+def build(state):
+    '''
+        Build a `etree.ElementTree` from the events of `state`, None when
+        nothing is written
+    '''
+    tree = None
+    for element in elements(state):
+        tree = etree.ElementTree(element)
+    return tree
+
+
+def leaf(xf, element):
+    '''
+        Write `element`, without children, to `xf`. Namespaced elements are
+        written in a element context so they use the declarations already
+        written instead of declaring the namespaces again.
+    '''
+    if element.tag[:1] != '{' and not any(
+            name[:1] == '{' for name in element.attrib):
+        xf.write(element)
+        return
+    with xf.element(element.tag, element.attrib):
+        if element.text:
+            xf.write(element.text)
+
+
+def write(state, xf):
+    '''
+        Write the events of `state` to the `etree.xmlfile` `xf`, elements
+        are written as soon as they are produced.
+    '''
+    stack = []
+    # Element not yet known to have children, written whole if it has none
+    last = None
+    for event, element in state.dump():
+        if event == 'start':
+            if last is not None:
+                context = xf.element(last.tag, last.attrib)
+                context.__enter__()
+                stack.append(context)
+                if last.text:
+                    xf.write(last.text)
+            last = element
+        elif event == 'end':
+            if last is not None:
+                leaf(xf, last)
+                last = None
+            else:
+                stack.pop().__exit__(None, None, None)
+        else:
+            assert False
@@ -1,106 +1,559 @@
 # vim: ts=4:sw=4:
 
-from .core import OMXState, TemplateData
+import bz2
+import gzip
+import lzma
+import os
+from io import BytesIO
+from lxml import etree
+from .core import TemplateData
+from .ref import Reference
 
-class LoadState(OMXState):
-    def __init__(self, omx):
-        OMXState.__init__(self, omx)
+
+class Complete(Exception):
+    ''' Raised to stop the parser when the loaded objects are complete '''
+
+
+class LoadState(object):
+    '''
+        Tracks the position of the parser in the compiled states of `omx`
+        and the `TemplateData` instances being collected
+
+        The events of the parser are fed to `push`, `data` and `pop`. These
+        are also available as `start`, `data` and `end` which lets the state
+        be used directly as the target of a lxml parser.
+    '''
+
+    def __init__(self, omx, machine, lenient=False, stop_when_complete=False,
+                 ids=True):
+        '''
+            When `lenient` is set elements without a target are skipped along
+            with their sub-tree instead of failing the load. Elements outside
+            the positions of a predicate are always skipped.
+
+            When `stop_when_complete` is set `pop` raises `Complete` once no
+            further events can add to the targets, after closing the open
+            elements.
+
+            `ids` selects the elements indexed by their `id` attribute in
+            `context()['ids']` and for references. Every element when True,
+            otherwise only those referenced before they end and, if `ids`
+            is a container, those whose id is in it. Nothing is indexed when
+            no template reads the ids. Referencing a element that was not
+            kept raises, as does a reference left unresolved at the end of
+            the document unless `lenient` is set.
+        '''
+
+        self.omx = omx
+        self.lenient = lenient
+        self.stop_when_complete = stop_when_complete
+        self.states = [machine.root]
+        # Positions seen of the windowed children of each element
+        self.counts = [{} if machine.root.windows else None]
+        self.records = [machine.plan.data()]
+        self.uids = []
         self.elemtails = []
-        self.context = {'ids': {}}
+        self.ids = ids if machine.ids else False
+        self.index = {}
+        self.context = {'ids': self.index}
+        # The unresolved `Reference`s to each id
+        self.waiting = {}
+        # The ids of the ended elements not kept in the index
+        self.dropped = set() if machine.ids else None
+        # Depth into a skipped sub-tree
+        self.skipping = 0
+
+    @property
+    def root(self):
+        ''' The target objects mapped by the root path are added to '''
+        return self.records[0].values[0]
+
+    def drain(self):
+        ''' Remove and return the objects added to the root target so far '''
+        root = self.root
+        objs = []
+        while not root.empty:
+            objs.append(root.pop())
+        objs.reverse()
+        return objs
 
-    def push(self, element):
-        ''' 
+    def push(self, tag, attrib):
+        '''
             Called when the parser descends into the tree, causing a new element
             to be pushed to the end of the path.
 
-            Initialises a TemplateData instance for the element if needed and fills
-            any attribute targets registered for the element
+            Initialises a TemplateData instance for the element if needed and
+            fills any attribute targets registered for the element
         '''
-        namespace = element.nsmap.get(element.prefix, '')
-        nsprefix = '{%s}' % namespace if namespace else ''
-        self.path.append(element.tag)
 
-        try:
-            target = self.get_target()
-        except KeyError as e:
-            # An early exit branch should be added to push/pop for the case
-            # when a subtree is not mapped to a object
-            pt = self.omx.get_template(namespace, self.path[:-1])
-            raise Exception(
-                "element without target '%s' @ %s"
-                % (element.tag, self.path)
-            )
-
-        # Push empty state to text collector
-        self.elemtails.append([])
-
-        if target is not None:
+        if self.skipping:
+            self.skipping += 1
+            return
+
+        parent = self.states[-1]
+        if parent.windows is not None:
+            window = parent.windows.get(tag)
+            if window is not None:
+                counts = self.counts[-1]
+                position = counts[tag] = counts.get(tag, -1) + 1
+                start, stop = window
+                if position < start or stop is not None and position >= stop:
+                    self.skipping = 1
+                    return
+
+        state = parent.transitions[tag]
+        if state is None:
+            if self.lenient:
+                self.skipping = 1
+                return
+            raise Exception("element without target '%s'" % (tag,))
+        self.states.append(state)
+        self.counts.append({} if state.windows is not None else None)
+
+        # Push empty state to text collector, if the text is mapped
+        self.elemtails.append([''] if state.text is not None else None)
+
+        records = self.records
+        if state.plan is not None:
             # Create TemplateData instance to collect data of this element
-            template = self.omx.get_template(namespace, self.path)
-            data = TemplateData(template, self)
-            target.scratch = data
-            if 'id' in element.attrib:
-                self.context['ids'][element.attrib['id']] = data
-
-        # Fill attribute targets
-        for k, v in element.attrib.items():
-            try:
-                target = self.get_target(
-                    self.path + ['@%s' % k]
-                )
-                target.add(v)
-            except KeyError:
-                pass
+            data = state.plan.data()
+            records.append(data)
+            uid = attrib.get('id')
+            self.uids.append(uid)
+            if uid is not None and self.ids is True:
+                self.index[uid] = data
 
-    def pop(self, element):
+        # Fill attribute targets, only looking up the mapped attributes
+        for name, record, index in state.attributes:
+            value = attrib.get(name)
+            if value is not None:
+                records[record].values[index].append(value)
+
+        for name, record, index, many in state.references:
+            value = attrib.get(name)
+            if value is not None:
+                if many:
+                    value = [self.resolve(uid) for uid in value.split()]
+                else:
+                    value = self.resolve(value)
+                records[record].values[index].append(value)
+
+    def resolve(self, uid):
+        '''
+            The object of the element with id `uid` or a `Reference` resolved
+            when the element ends
+        '''
+        obj = self.index.get(uid, Reference)
+        if obj is Reference and uid in self.dropped:
+            raise Exception("reference to '%s' which was not kept" % (uid,))
+        if obj is Reference or isinstance(obj, TemplateData):
+            obj = Reference(uid)
+            self.waiting.setdefault(uid, []).append(obj)
+        return obj
+
+    def data(self, text):
+        ''' Called with text content of the current element '''
+
+        if self.skipping or not self.elemtails:
+            return
+        tails = self.elemtails[-1]
+        if tails is not None:
+            tails[-1] += text
+
+    def pop(self, tag=None, text=None):
         ''' Called when the parser ascends the tree, causing the last element
             of the path to be popped.
 
-            Fills text() and context() targets
-            Replaces target TemplateData with destination object instance.
+            `text` is the text before the first child of the element for
+            parsers not reporting it with `data`, the text after comments
+            and processing instructions among it is still reported.
+
+            Fills text(), string(), normalize-space() and context() targets
+            Creates the object of the element from its TemplateData.
         '''
 
-        assert self.path[-1] == element.tag
+        if self.skipping:
+            self.skipping -= 1
+            if not self.skipping and self.elemtails:
+                tails = self.elemtails[-1]
+                if tails is not None:
+                    tails.append('')
+            return
+
+        state = self.states.pop()
+        self.counts.pop()
+        records = self.records
 
-        # Pop text collector state and add the text tail of element
+        # Pop text collector state and start collecting the tail of element
         tails = self.elemtails.pop()
-        if len(self.elemtails) > 0:
-            self.elemtails[-1].append(element.tail or '')
+        if self.elemtails:
+            parent = self.elemtails[-1]
+            if parent is not None:
+                parent.append('')
 
         # Fill text target: text of current element + tail of all child elements
-        try:
-            target = self.get_target(self.path + ['text()'])
-            text = [element.text or ''] + tails
-            target.add(text)
-        except KeyError:
-            pass
+        if tails is not None:
+            if text is not None:
+                tails[0] = text + tails[0]
+            record, index, convert = state.text
+            if convert is not None:
+                tails = convert(tails)
+            records[record].values[index].append(tails)
 
         # Fill context target
-        try:
-            target = self.get_target(self.path + ['context()'])
-            target.add(self.context)
-        except KeyError:
-            pass
-
-        target = self.get_target()
-        if target is None:
-            self.path.pop()
+        if state.context is not None:
+            record, index = state.context
+            records[record].values[index].append(self.context)
+
+        if state.plan is not None:
+            # Create object from TemplateData
+            obj = records.pop().create()
+
+            record, index = state.slot
+            records[record].values[index].append(obj)
+
+            # Save in ID dictionary if id is set and resolve references
+            uid = self.uids.pop()
+            if uid is not None:
+                references = self.waiting.pop(uid, None)
+                if references is not None:
+                    for reference in references:
+                        reference.resolve(obj)
+                    self.index[uid] = obj
+                elif self.ids is True or self.ids and uid in self.ids:
+                    self.index[uid] = obj
+                elif self.dropped is not None:
+                    self.dropped.add(uid)
+
+        if self.stop_when_complete and self.complete():
+            # Close the open elements to create their objects
+            self.stop_when_complete = False
+            while len(self.states) > 1:
+                self.pop()
+            raise Complete()
+
+    def complete(self):
+        '''
+            True if no further events can add to the targets, every open
+            element having seen all children it takes and not collecting text
+        '''
+        states = self.states
+        if len(states) < 2:
+            return False
+        # The document element is unique so the root state is never waiting
+        for i in range(1, len(states)):
+            state = states[i]
+            if not state.finite:
+                return False
+            if state.windows is not None:
+                counts = self.counts[i]
+                for tag, (start, stop) in state.windows.items():
+                    if counts.get(tag, -1) + 1 < stop:
+                        return False
+        return True
+
+    def close(self):
+        '''
+            Called when the parser is done, returns the loaded objects.
+
+            lxml also calls this after a failed callback, so the end of the
+            document is checked by `ended` once parsing succeeded instead.
+        '''
+        return self.root.get()
+
+    def ended(self):
+        '''
+            Raise if the document ended with elements still open, or with
+            references to ids never seen unless lenient
+        '''
+        if len(self.states) > 1:
+            raise Exception("Unexpected end of xml stream")
+        if self.waiting and not self.lenient:
+            raise Exception("unresolved references to %s" % (
+                ', '.join("'%s'" % (uid,) for uid in sorted(self.waiting))))
+
+    # lxml parser target interface
+    start = push
+    end = pop
+
+
+class Loader(object):
+    '''
+        Loads a document fed to it in chunks as they arrive, see `OMX.loader`
+
+        The chunks are fed to a lxml parser with `state` as its target, so
+        objects are completed as soon as the chunk holding their end tag is
+        fed.
+    '''
+
+    def __init__(self, state):
+        self.state = state
+        self.parser = etree.XMLParser(target=state)
+        # Set once the state raised `Complete`, further data is ignored
+        self.complete = False
+
+    def feed(self, data):
+        ''' Parse the next chunk of the document '''
+        if self.complete:
             return
+        try:
+            self.parser.feed(data)
+        except Complete:
+            self.complete = True
+
+    def collect(self):
+        ''' Remove and return the objects completed so far '''
+        return self.state.drain()
+
+    def close(self):
+        '''
+            Called at the end of the document, returns the objects not yet
+            collected. Raises if the document is incomplete.
+        '''
+        if not self.complete:
+            try:
+                self.parser.close()
+            except Complete:
+                pass
+            else:
+                self.state.ended()
+        return self.state.drain()
+
+
+class BufferReader(object):
+    '''
+        A file-like object reading from a buffer, such as a `bytearray` or
+        `memoryview`, only copying the pieces read
+    '''
+
+    def __init__(self, buf):
+        self.view = memoryview(buf).cast('B')
+        self.position = 0
+
+    def read(self, size=-1):
+        start = self.position
+        if size < 0:
+            end = len(self.view)
+        else:
+            end = min(start + size, len(self.view))
+        self.position = end
+        return self.view[start:end].tobytes()
+
+
+class Prefixed(object):
+    ''' A file-like object reading `head` before the rest of `fileobj` '''
+
+    def __init__(self, head, fileobj):
+        self.head = head
+        self.fileobj = fileobj
+
+    def read(self, size=-1):
+        head = self.head
+        if not head:
+            return self.fileobj.read(size)
+        if 0 <= size <= len(head):
+            self.head = head[size:]
+            return head[:size]
+        self.head = b''
+        return head + self.fileobj.read(-1 if size < 0 else size - len(head))
+
+
+# Magic bytes of the compressed formats and the functions opening a file
+# name and wrapping a file-like object of each
+compressions = (
+    (b'\x1f\x8b', gzip.open, lambda f: gzip.GzipFile(fileobj=f, mode='rb')),
+    (b'BZh', bz2.open, bz2.BZ2File),
+    (b'\xfd7zXZ\x00', lzma.open, lzma.LZMAFile),
+)
 
-        # Create object from TemplateData and clean up
-        data = target.scratch
-        assert isinstance(data, TemplateData)
-        del target.scratch
+MAGIC = max(len(magic) for magic, byname, wrap in compressions)
 
-        self.prune_targets(self.path)
 
-        obj = data.create()
+def compression(head):
+    ''' Get the entry of `compressions` matching `head`, if any '''
+    for entry in compressions:
+        if head.startswith(entry[0]):
+            return entry
+    return None
+
+
+def peek(fileobj):
+    '''
+        Get the first bytes of `fileobj` without consuming them and the
+        file-like object to read from afterwards
+    '''
+    if hasattr(fileobj, 'peek'):
+        return fileobj.peek(MAGIC)[:MAGIC], fileobj
+    try:
+        position = fileobj.tell()
+    except (AttributeError, IOError, OSError, ValueError):
+        head = fileobj.read(MAGIC)
+        return head, Prefixed(head, fileobj)
+    head = fileobj.read(MAGIC)
+    fileobj.seek(position)
+    return head, fileobj
+
+
+def openfile(name):
+    ''' Open the file `name` for reading, decompressing it if needed '''
+    with open(name, 'rb') as f:
+        head = f.read(MAGIC)
+    entry = compression(head)
+    if entry is None:
+        return open(name, 'rb')
+    return entry[1](name, 'rb')
+
+
+def reader(xmldata, native=False):
+    '''
+        Get what the parser reads `xmldata` from. File names and paths are
+        left for libxml2 to read, `bytes` are read in place and other
+        buffers read in pieces. File-like objects, including `mmap`, are
+        used as is.
+
+        Data compressed with gzip, bzip2 or xz is detected by its magic bytes
+        and decompressed as it is read, compressed files are opened in their
+        place. With `native` gzip files are also left to libxml2, which only
+        decompresses them when parsing a file name with `etree.parse`.
+    '''
+    if hasattr(xmldata, '__fspath__'):
+        xmldata = os.fspath(xmldata)
+    if isinstance(xmldata, str):
+        with open(xmldata, 'rb') as f:
+            entry = compression(f.read(MAGIC))
+        if entry is None or native and entry[0] == b'\x1f\x8b':
+            return xmldata
+        return entry[1](xmldata, 'rb')
+
+    if isinstance(xmldata, bytes):
+        # Shares the buffer of xmldata until written to
+        head, xmldata = xmldata[:MAGIC], BytesIO(xmldata)
+    elif isinstance(xmldata, (bytearray, memoryview)):
+        xmldata = BufferReader(xmldata)
+        head = xmldata.view[:MAGIC].tobytes()
+    else:
+        head, xmldata = peek(xmldata)
+
+    entry = compression(head)
+    if entry is None:
+        return xmldata
+    return entry[2](xmldata)
+
+
+def closing(opened, xmldata):
+    ''' Close `opened` if it was opened by `reader` for `xmldata` '''
+    if opened is not xmldata and hasattr(opened, 'close'):
+        opened.close()
+
+
+def iterparse(state, xmldata, stream=False, bounded=False):
+    '''
+        Feed the elements of `xmldata` to `state` using `etree.iterparse`.
+
+        When `stream` is set objects are removed from the root target and
+        yielded as soon as they are completed.
+
+        When `bounded` is set processed elements are also removed from their
+        parent so only the ancestors of the current element are kept.
+    '''
+
+    root = state.root
+    opened = reader(xmldata)
+    try:
+        events = ('start', 'end', 'comment', 'pi')
+        # The tail of a node is only known to be parsed by the next event,
+        # so it is delivered then as text of the parent
+        last = None
+        for event, element in etree.iterparse(opened, events=events):
+            if last is not None:
+                if last.tail:
+                    state.data(last.tail)
+                    last.tail = None
+                last = None
+
+            if event == 'start':
+                state.push(element.tag, element.attrib)
+            elif event in ('comment', 'pi'):
+                last = element
+            elif event == 'end':
+                state.pop(element.tag, element.text or '')
+                element.clear(keep_tail=True)
+                last = element
+                parent = element.getparent()
+                if bounded and parent is not None:
+                    # Cleared elements are still linked from their parent,
+                    # the document element has no parent to remove from
+                    while element.getprevious() is not None:
+                        del parent[0]
+                if stream and not root.empty:
+                    yield root.pop()
+            else:  # pragma: no cover
+                assert False
+    except Complete:
+        if stream:
+            for obj in state.drain():
+                yield obj
+        return
+    # lxml bug workaround
+    except etree.XMLSyntaxError as e:
+        if e.text is not None:
+            raise e
+    finally:
+        closing(opened, xmldata)
+
+    state.ended()
+
+
+def targetparse(state, xmldata, stream=False, bounded=False, size=65536):
+    '''
+        Feed `xmldata` to `state` used as the target of a lxml parser, no
+        elements are created.
+
+        When `stream` is set the data is fed to the parser in chunks of
+        `size` bytes and the objects completed by each chunk are removed
+        from the root target and yielded. The data is also fed in chunks
+        when the state stops when complete. `bounded` has no effect as no
+        tree is built.
+    '''
+
+    parser = etree.XMLParser(target=state)
+    whole = not stream and not state.stop_when_complete
+    opened = reader(xmldata, native=whole)
+    if whole:
+        try:
+            etree.parse(opened, parser)
+        finally:
+            closing(opened, xmldata)
+        state.ended()
+        return
 
-        target.add(obj)
+    # Feeding the parser lets reading stop as soon as the state is complete
+    if hasattr(opened, 'read'):
+        source = opened
+    else:
+        source = openfile(opened)
+    try:
+        chunk = source.read(size)
+        while chunk:
+            parser.feed(chunk)
+            if stream:
+                for obj in state.drain():
+                    yield obj
+            chunk = source.read(size)
+        parser.close()
+        state.ended()
+    except Complete:
+        pass
+    finally:
+        closing(source, xmldata)
 
-        # Save in ID dictionary if id is set
-        if 'id' in element.attrib:
-            self.context['ids'][element.attrib['id']] = obj
+    if stream:
+        for obj in state.drain():
+            yield obj
 
-        self.path.pop()
 
+# The functions available to drive a LoadState with the parser
+engines = {
+    'iterparse': iterparse,
+    'target': targetparse,
+}
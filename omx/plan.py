@@ -0,0 +1,291 @@
+# vim: ts=4:sw=4:
+'''
+    Compiled form of the templates used when loading
+
+    The paths of each template are merged into a tree of `Node`s once. The
+    nodes of all templates that may collect data at some point of a document
+    are combined into a `State`, and the states are linked by the tags of the
+    elements that move the loader between them. Moving to the next state when
+    the parser enters an element is a single dictionary lookup.
+'''
+
+from . import decl
+from .template import Template
+from .core import TemplatePlan
+
+
+def split(tag):
+    ''' Split a tag in clark notation into namespace and local name '''
+    if tag[:1] == '{':
+        namespace, local = tag[1:].split('}', 1)
+        return namespace, local
+    return '', tag
+
+
+def normalize(fragments):
+    ''' The text of `fragments` stripped with inner whitespace collapsed '''
+    return ' '.join(''.join(fragments).split())
+
+
+# The text pseudo elements and how the collected fragments are delivered,
+# None leaving the list of fragments as is
+texts = {
+    'text()': None,
+    'string()': ''.join,
+    'normalize-space()': normalize,
+}
+
+
+class Node(object):
+    '''A step in the paths of a template
+
+    `children` maps tags to the nodes below this one. `slot` is the index of
+    the target elements reaching this node are collected to, `attributes`
+    maps attribute names to target indices and `text` and `context` are the
+    target indices of the pseudo elements of the same name. `references`
+    maps the names of the attributes that are references to their kind, see
+    `omx.ref`. `text` is shared
+    by all pseudo elements of `texts`, `convert` is the conversion of the one
+    used.
+
+    `window` is the (start, stop) positions among its siblings of the
+    elements entering the node or None to enter all.
+    '''
+
+    def __init__(self, window=None):
+        self.children = {}
+        self.window = window
+        self.slot = None
+        self.attributes = {}
+        self.references = {}
+        self.text = None
+        self.convert = None
+        self.context = None
+
+    @property
+    def empty(self):
+        return not (self.children or self.attributes or
+                    self.text is not None or self.context is not None)
+
+
+def claim(path, old, index):
+    if old is not None:
+        raise Exception('Path [%r] already claimed by %r' % (path, old))
+    return index
+
+
+def descend(node, step, path):
+    ''' Get or create the child of `node` entered by `step` '''
+    tag, window = decl.window(step)
+    child = node.children.get(tag)
+    if child is None:
+        child = node.children[tag] = Node(window)
+    elif child.window != window:
+        raise Exception('Path [%r] conflicts in position with %r' %
+                        (path, child.window))
+    return child
+
+
+def tree(targets):
+    '''
+        Build a `Node` tree from a sequence of ((cls, paths), name) pairs
+        like `Template.targets`, the index of each pair in the sequence is
+        stored in the nodes its paths lead to.
+    '''
+
+    root = Node()
+    for index, ((cls, paths), name) in enumerate(targets):
+        for path in paths:
+            if not path:
+                continue
+            node = root
+            for step in path[:-1]:
+                node = descend(node, step, path)
+
+            step = path[-1]
+            if step.startswith('@'):
+                node.attributes[step[1:]] = claim(
+                    path, node.attributes.get(step[1:]), index)
+                kind = getattr(cls, 'idref', None)
+                if kind is not None:
+                    node.references[step[1:]] = kind
+            elif step in texts:
+                node.text = claim(path, node.text, index)
+                node.convert = texts[step]
+            elif step == 'context()':
+                node.context = claim(path, node.context, index)
+            else:
+                child = descend(node, step, path)
+                child.slot = claim(path, child.slot, index)
+    return root
+
+
+def reads_ids(template):
+    ''' True if `template` has a `context()` or reference target '''
+    for (cls, paths), name in template.targets:
+        if getattr(cls, 'idref', None) is not None:
+            return True
+        if any(path and path[-1] == 'context()' for path in paths):
+            return True
+    return False
+
+
+class Transitions(dict):
+    ''' Maps tags to the next `State`, compiling states on first use '''
+
+    def __init__(self, state):
+        dict.__init__(self)
+        self.state = state
+
+    def __missing__(self, tag):
+        value = self[tag] = self.state.machine.step(self.state, tag)
+        return value
+
+
+class State(object):
+    '''A point in the document where a fixed set of targets may be filled
+
+    Targets are referred to by pairs of (record, index) where record is a
+    negative index into the stack of `TemplateData` instances of the loader
+    and index is the position of the target in its `values`.
+
+    `plan` is the `TemplatePlan` of the element entering this state, if any,
+    and `slot` the reference to the target the object created from it is
+    added to, relative to the stack after it has been popped.
+
+    `attributes` is a tuple of (name, record, index) for each attribute
+    mapped in this state and `references` a tuple of (name, record, index,
+    many) for each attribute that is a reference, many being set for
+    `idrefs`. `context` is a reference or None and `text` a
+    (record, index, convert) triple or None. Text is only collected in states
+    with `text` set.
+
+    `windows` maps the tags of children entered only at some positions to
+    their (start, stop) window, or is None when there are no such children.
+    `finite` is set when no text is collected and every child is windowed,
+    so the state may be done before its element ends.
+    '''
+
+    def __init__(self, machine, parts, plan=None, slot=None):
+        self.machine = machine
+        self.parts = parts
+        self.plan = plan
+        self.slot = slot
+
+        attributes = {}
+        references = []
+        text = context = None
+        for node, depth in parts:
+            record = -1 - depth
+            for name, index in node.attributes.items():
+                claim('@' + name, attributes.get(name), None)
+                attributes[name] = (record, index)
+                if name in node.references:
+                    references.append((name, record, index,
+                                       node.references[name] == 'idrefs'))
+            if node.text is not None:
+                text = claim('text()', text,
+                             (record, node.text, node.convert))
+            if node.context is not None:
+                context = claim('context()', context, (record, node.context))
+
+        self.references = tuple(references)
+        refnames = set(name for name, record, index, many in references)
+        self.attributes = tuple(
+            (name, record, index)
+            for name, (record, index) in attributes.items()
+            if name not in refnames)
+        self.text = text
+        self.context = context
+
+        windows = {}
+        for node, depth in parts:
+            for tag, child in node.children.items():
+                if windows.setdefault(tag, child.window) != child.window:
+                    raise Exception('Positions of %r conflict' % (tag,))
+        self.windows = dict(
+            (tag, window) for tag, window in windows.items()
+            if window is not None) or None
+        # No text and a limited number of children to wait for
+        self.finite = text is None and all(
+            window is not None and window[1] is not None
+            for window in windows.values())
+
+        self.transitions = Transitions(self)
+
+    def __repr__(self):
+        return '<State of %r>' % (self.plan,)
+
+
+class Machine(object):
+    '''The states used to load documents with `omx` mapped to `target`
+
+    States are compiled as the tags leading to them are first seen and then
+    shared by every load using the machine.
+
+    `ids` is set when any template of `omx` reads elements by their id,
+    through `context()` or a reference.
+    '''
+
+    def __init__(self, omx, target):
+        self.omx = omx
+        self.plan = TemplatePlan(Template(None, (target,)), compact=False)
+        self._states = {}
+        self.root = State(self, ((self.plan.tree, 0),))
+        self.ids = any(
+            reads_ids(template)
+            for ns in omx.ns.values()
+            for template in ns._templates.values())
+
+    def compile(self):
+        '''
+            Compile every state reachable from the root. States leading to
+            elements without a template are left to fail when loading.
+        '''
+
+        pending = [self.root]
+        seen = set(pending)
+        while pending:
+            state = pending.pop()
+            tags = set()
+            for node, depth in state.parts:
+                tags.update(node.children)
+            for tag in tags:
+                try:
+                    new = state.transitions[tag]
+                except KeyError:
+                    continue
+                if new is not None and new not in seen:
+                    seen.add(new)
+                    pending.append(new)
+
+    def step(self, state, tag):
+        ''' Compile the state reached from `state` when entering `tag` '''
+
+        parts = []
+        slot = None
+        for node, depth in state.parts:
+            child = node.children.get(tag)
+            if child is None:
+                continue
+            if child.slot is not None:
+                slot = claim(tag, slot, (-1 - depth, child.slot))
+            if not child.empty:
+                parts.append((child, depth))
+
+        plan = None
+        if slot is not None:
+            namespace, template = self.omx.template_for(tag)
+            plan = self.omx.plan(template)
+            parts = [(node, depth + 1) for node, depth in parts]
+            if not plan.tree.empty:
+                parts.append((plan.tree, 0))
+        elif not parts:
+            return None
+
+        key = (plan, slot, tuple(parts))
+        try:
+            return self._states[key]
+        except KeyError:
+            new = self._states[key] = State(self, tuple(parts), plan, slot)
+            return new
@@ -0,0 +1,66 @@
+# vim: ts=4:sw=4:
+'''
+    References between elements by their `id` attribute
+
+    A attribute declared with the `idref` conversion, as in `'@ref:idref'`,
+    is loaded as the object created from the element whose `id` it names and
+    one declared with `idrefs` as the list of objects of a whitespace
+    separated list of ids.
+
+    The object of a element is only created when the element ends, so a
+    reference to a element not yet ended, later in the document or an
+    ancestor, is loaded as a `Reference` that is resolved when it ends.
+    References to ids never seen raise when loading ends, unless lenient.
+
+    When dumping the `id` attribute of each object is written, or the `id`
+    of a `Reference`, and strings are written as they are.
+'''
+
+from .target import variant
+
+
+class Reference(object):
+    ''' A reference to the object of the element with id `id` '''
+
+    __slots__ = ('id', 'obj', 'resolved')
+
+    def __init__(self, id):
+        self.id = id
+        self.obj = None
+        self.resolved = False
+
+    def __repr__(self):
+        return '<Reference(id=%r, resolved=%r)>' % (self.id, self.resolved)
+
+    def resolve(self, obj):
+        self.obj = obj
+        self.resolved = True
+
+
+def ident(value):
+    ''' The id written for the referenced `value` '''
+    return str(getattr(value, 'id', value))
+
+
+def idrefs(values):
+    return ' '.join(map(ident, values))
+
+
+# The format of the values of each kind of reference
+kinds = {
+    'idref': ident,
+    'idrefs': idrefs,
+}
+
+
+def reference(base, kind):
+    '''
+        Get a subclass of `base` whose values are references of `kind`,
+        resolved when loading and written as ids when dumping
+    '''
+    try:
+        format = kinds[kind]
+    except KeyError:
+        raise ValueError('unknown reference %r' % (kind,))
+    return variant(base, ('reference', kind), None, format,
+                   (reference, (base, kind)), idref=kind)
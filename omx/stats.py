@@ -0,0 +1,186 @@
+# vim: ts=4:sw=4:
+'''
+    Opt-in instrumentation of loading and dumping
+
+    Profiling replaces the states and the class of the `TemplateData`
+    instances used with timed subclasses, so loads and dumps without stats
+    run the plain code.
+'''
+
+from contextlib import contextmanager
+from timeit import default_timer as clock
+from .core import TemplateData
+from .load import LoadState
+from .dump import DumpState
+
+
+class TemplateStats(object):
+    '''Counters of a single template
+
+    `count` is the number of objects created or serialised, `create` the
+    seconds spent in the factory and `serialise` the seconds spent in the
+    serialiser, not counting the time omx spends building the arguments of
+    the factory or setting the values given by the serialiser.
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.create = 0.0
+        self.serialise = 0.0
+
+    def __repr__(self):
+        return '<TemplateStats count=%d create=%.6f serialise=%.6f>' % (
+            self.count, self.create, self.serialise)
+
+
+class Stats(object):
+    '''Statistics of one or more loads or dumps
+
+    `templates` maps each `Template` used to its `TemplateStats`.
+
+    `seconds` is the total time of the operations, `handling` the part of it
+    spent handling parser events in omx, including the templates, while the
+    rest is spent in lxml parsing or writing.
+    '''
+
+    def __init__(self):
+        self.templates = {}
+        self.seconds = 0.0
+        self.handling = 0.0
+
+    def __repr__(self):
+        return '<Stats seconds=%.6f internal=%.6f templates=%d>' % (
+            self.seconds, self.internal, len(self.templates))
+
+    def template(self, template):
+        try:
+            return self.templates[template]
+        except KeyError:
+            stats = self.templates[template] = TemplateStats()
+            return stats
+
+    @property
+    def internal(self):
+        ''' Seconds spent in omx itself, outside of the templates '''
+        return self.handling - sum(
+            t.create + t.serialise for t in self.templates.values())
+
+    @property
+    def parsing(self):
+        ''' Seconds spent outside of omx, in the parser or writer '''
+        return self.seconds - self.handling
+
+
+def profiled_data(stats):
+    ''' A `TemplateData` class recording its time in `stats` '''
+
+    class ProfiledTemplateData(TemplateData):
+        # No new fields so existing instances can be switched to this class
+        __slots__ = ()
+
+        def create(self):
+            args, kwargs = self.arguments()
+            start = clock()
+            try:
+                return self.template._factory(*args, **kwargs)
+            finally:
+                t = stats.template(self.template)
+                t.count += 1
+                t.create += clock() - start
+
+        def dump(self, obj):
+            start = clock()
+            try:
+                return TemplateData.dump(self, obj)
+            finally:
+                t = stats.template(self.template)
+                t.count += 1
+                t.serialise += clock() - start
+
+        def assign(self, *args, **kwargs):
+            # Taken back from the time of the serialiser calling it
+            start = clock()
+            try:
+                TemplateData.assign(self, *args, **kwargs)
+            finally:
+                stats.template(self.template).serialise -= clock() - start
+
+    return ProfiledTemplateData
+
+
+class ProfiledLoadState(LoadState):
+    ''' A `LoadState` recording time spent handling each event in `stats` '''
+
+    def __init__(self, omx, machine, lenient, stats,
+                 stop_when_complete=False, ids=True):
+        LoadState.__init__(self, omx, machine, lenient, stop_when_complete,
+                           ids)
+        self.stats = stats
+        self.datacls = profiled_data(stats)
+
+    def push(self, tag, attrib):
+        start = clock()
+        records = self.records
+        depth = len(records)
+        try:
+            LoadState.push(self, tag, attrib)
+            if len(records) > depth:
+                records[-1].__class__ = self.datacls
+        finally:
+            self.stats.handling += clock() - start
+
+    def data(self, text):
+        start = clock()
+        try:
+            LoadState.data(self, text)
+        finally:
+            self.stats.handling += clock() - start
+
+    def pop(self, tag=None, text=None):
+        start = clock()
+        try:
+            LoadState.pop(self, tag, text)
+        finally:
+            self.stats.handling += clock() - start
+
+    start = push
+    end = pop
+
+
+class ProfiledDumpState(DumpState):
+    ''' A `DumpState` recording time spent producing events in `stats` '''
+
+    def __init__(self, omx, stats):
+        DumpState.__init__(self, omx)
+        self.stats = stats
+        self.datacls = profiled_data(stats)
+
+    def dump(self):
+        events = DumpState.dump(self)
+        while True:
+            start = clock()
+            try:
+                event = next(events)
+            except StopIteration:
+                return
+            finally:
+                self.stats.handling += clock() - start
+            yield event
+
+
+@contextmanager
+def profile(stats):
+    '''
+        Time the block as one operation recorded to the `stats` argument of
+        a load or dump, either a `Stats` instance to add to or a callback
+        called with a new `Stats` when done.
+    '''
+    if isinstance(stats, Stats):
+        callback = None
+    else:
+        callback, stats = stats, Stats()
+    start = clock()
+    yield stats
+    stats.seconds += clock() - start
+    if callback is not None:
+        callback(stats)
@@ -1,24 +1,62 @@
 
+try:
+    import copyreg
+except ImportError:
+    import copy_reg as copyreg
+
+
+class Pending(object):
+    '''The values given to `Target.set`, consumed in order one at a time
+
+    Any iterable is accepted and only read as far as values are popped.
+    '''
+
+    __slots__ = ('_values', '_next')
+
+    _end = object()
+
+    def __init__(self, values):
+        self._values = iter(values)
+        self._next = next(self._values, self._end)
+
+    def __bool__(self):
+        return self._next is not self._end
+    __nonzero__ = __bool__
+
+    def pop(self):
+        value = self._next
+        if value is self._end:
+            raise IndexError("pop from empty Pending")
+        self._next = next(self._values, self._end)
+        return value
+
+
 class Target(object):
     '''Holds the data passed to a factory as 'name'
 
     In general 'data' will be a list of objects created from other templates,
     but may be string when mapped to a attribute or text()
 
-    During load the scratch property may hold the TemplateData that will be the next item.
+    When loading, targets of exactly `Target` and `Singleton` are stored as
+    plain lists in the `TemplateData` rather than as instances, subclasses
+    are instantiated and fed through `add`.
     '''
 
+    # `pattern` is the pattern being collected to this target
+    __slots__ = ('name', 'pattern', '_data')
+
     # Static field indicating if the target expects a single value
     singleton = False
 
-    # Used to hold value currently being assembled
-    scratch = None
+    # Conversion of each collected value, see `typed`
+    convert = None
 
-    # Pattern being collect to this target
-    pattern = None
+    # Applied to the collected values when the object is created, see `variant`
+    finish = None
 
-    def __init__(self, name):
+    def __init__(self, name, pattern=None):
         self.name = name
+        self.pattern = pattern
         self._data = []
 
     def __repr__(self):
@@ -31,11 +69,15 @@ class Target(object):
         A empty target indicates to the dumper to stop processing
         '''
 
-        return len(self._data) == 0
+        return not self._data
 
     def add(self, value):
         self._data.append(value)
 
+    def append(self, value):
+        ''' Same as `add`, shared with the plain lists used when loading '''
+        self.add(value)
+
     def pop(self):
         return self._data.pop()
 
@@ -43,14 +85,16 @@ class Target(object):
         return self._data
 
     def set(self, d):
-        self._data = list(d)[::-1]
+        self._data = Pending(d)
 
 
 class Singleton(Target):
+    __slots__ = ()
+
     singleton = True
 
-    def __init__(self, name):
-        Target.__init__(self, name)
+    def __init__(self, name, pattern=None):
+        Target.__init__(self, name, pattern)
         self._data = None
 
     @property
@@ -71,3 +115,77 @@ class Singleton(Target):
 
     def set(self, d):
         self._data = d
+
+
+# Classes whose values may be collected in plain lists when loading
+_plain = set([Target, Singleton])
+_variants = {}
+
+
+class Variant(type):
+    '''
+        The type of the classes made by `variant`, pickled as the call
+        making them again
+    '''
+
+    def __reduce__(cls):
+        if cls.rebuild is None:
+            return cls.__name__
+        return cls.rebuild
+
+
+copyreg.pickle(Variant, Variant.__reduce__)
+
+
+def plain(cls):
+    ''' True if `cls` collects values like `Target` or `Singleton` '''
+    return cls in _plain
+
+
+def variant(base, key, finish, format, rebuild=None, **attrs):
+    '''
+        Get a subclass of `base` applying `finish` to the collected values,
+        the list or the single value of a singleton, when the object is
+        created and formatting each value with `format` when dumped.
+
+        Subclasses are shared by `base` and `key`, `attrs` are added to new
+        subclasses. `rebuild` is a (function, args) pair returning the
+        subclass when called, used to pickle it.
+    '''
+    key = (base, key)
+    try:
+        return _variants[key]
+    except KeyError:
+        pass
+
+    def set(self, d):
+        if self.singleton:
+            base.set(self, None if d is None else format(d))
+        else:
+            base.set(self, (format(x) for x in d))
+
+    attrs.update({
+        '__slots__': (),
+        'finish': staticmethod(finish),
+        'set': set,
+        'rebuild': rebuild,
+    })
+    cls = Variant(base.__name__, (base,), attrs)
+    if base in _plain:
+        _plain.add(cls)
+    _variants[key] = cls
+    return cls
+
+
+def typed(base, convert, format, rebuild=None):
+    '''
+        Get a subclass of `base` whose values are converted by `convert` when
+        the object is created and formatted by `format` when dumped
+    '''
+    if base.singleton:
+        finish = convert
+    else:
+        def finish(values):
+            return list(map(convert, values))
+    return variant(base, ('typed', convert, format), finish, format, rebuild,
+                   convert=staticmethod(convert))
@@ -1,6 +1,23 @@
+import sys
 from . import decl
 
 
+def nothing():
+    ''' The default factory of templates '''
+    return None
+
+
+def identity(values, obj):
+    ''' The default serialiser of templates, passes `obj` as is '''
+    return values(obj)
+
+
+def lookup(module, name):
+    ''' Find the template stored as `name` in `module` '''
+    __import__(module)
+    return getattr(sys.modules[module], name)
+
+
 class TemplateHint(object):
     '''A template, obj pair
 
@@ -8,6 +25,8 @@ class TemplateHint(object):
     needed when present in a multitarget
     '''
 
+    __slots__ = ('template', 'obj')
+
     def __init__(self, template, obj):
         self.template = template
         self.obj = obj
@@ -24,8 +43,8 @@ class Template(object):
     '''Defines how elements matched by `match` is converted to objects'''
 
     def __init__(self, match, ptargets=None, ktargets=None,
-                 factory=lambda: None,
-                 serialiser=lambda values, obj: values(obj),
+                 factory=nothing,
+                 serialiser=identity,
                  nsmap=None):
         '''
         `match` the tag this template maps
@@ -61,6 +80,18 @@ class Template(object):
     def __repr__(self):
         return '<Template matching "%s">' % (self.match,)
 
+    def __reduce_ex__(self, protocol):
+        '''
+            Templates defined by decorating a module level function replace
+            the function in its module and are pickled as a reference to it,
+            others are pickled by value.
+        '''
+        module = getattr(self._factory, '__module__', None)
+        name = getattr(self._factory, '__name__', None)
+        if getattr(sys.modules.get(module), name or '', None) is self:
+            return (lookup, (module, name))
+        return object.__reduce_ex__(self, protocol)
+
     def factory(self, fun):
         ''' Use `fun` as the factory, to be used as decorator '''
         self._factory = fun
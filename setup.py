@@ -9,6 +9,7 @@ setup(
     description='Declarative XML parsing and serialization',
     license='MIT',
     keywords='xml lxml etree declarative',
+    python_requires='>=3.7',
     install_requires=['lxml'],
     extras_require={'tests': ['nose', 'mock', 'PyHamcrest']}
 )
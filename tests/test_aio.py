@@ -0,0 +1,74 @@
+import asyncio
+from hamcrest import assert_that, equal_to, greater_than
+from .matchers import assert_raises
+
+from omx import OMX, Template
+
+itemt = Template('item', ('@key',), factory=lambda key: key)
+roott = Template('root', ('item',), factory=lambda items: items)
+
+
+def document(count):
+    body = b''.join(b'<item key="%d"/>' % i for i in range(count))
+    return b'<root>' + body + b'</root>'
+
+
+def reader(data):
+    stream = asyncio.StreamReader()
+    stream.feed_data(data)
+    stream.feed_eof()
+    return stream
+
+
+async def pieces(data, size):
+    for i in range(0, len(data), size):
+        await asyncio.sleep(0)
+        yield data[i:i + size]
+
+
+def test_aload():
+    omx = OMX((roott, itemt), 'root')
+
+    async def main():
+        return await omx.aload(reader(document(3)))
+
+    assert_that(asyncio.run(main()), equal_to(['0', '1', '2']))
+
+
+def test_aiterload():
+    omx = OMX((itemt,), 'root/item')
+
+    async def main():
+        return [obj async for obj in omx.aiterload(pieces(document(50), 7))]
+
+    assert_that(asyncio.run(main()), equal_to([str(i) for i in range(50)]))
+
+
+def test_aload_incomplete():
+    omx = OMX((roott, itemt), 'root')
+
+    async def main():
+        return await omx.aload(reader(b'<root><item key="1"/>'))
+
+    with assert_raises(Exception):
+        asyncio.run(main())
+
+
+def test_budget():
+    omx = OMX((roott, itemt), 'root')
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0)
+
+    async def main():
+        task = asyncio.ensure_future(ticker())
+        result = await omx.aload(reader(document(2000)), size=512, budget=0)
+        task.cancel()
+        return result
+
+    result = asyncio.run(main())
+    assert_that(len(result), equal_to(2000))
+    assert_that(len(ticks), greater_than(10))
@@ -0,0 +1,181 @@
+import pickle
+from io import BytesIO
+from hamcrest import (assert_that, equal_to, instance_of, less_than,
+                      same_instance)
+from .matchers import assert_raises
+
+from omx import OMX, Namespace, Template, template
+from omx.columns import column
+from omx.stats import Stats
+
+
+@template('item', ('@key', 'text()'))
+def itemt(key, value):
+    return key, ''.join(value)
+
+
+@template('items', ('item',))
+def itemst(items):
+    if not items:
+        raise ValueError('no items')
+    return dict(items)
+
+
+documents = [
+    b'<items><item key="a">x</item></items>',
+    b'<items/>',
+    b'<items><item key="b">y</item><item key="c">z</item></items>',
+    b'<items><item key="d">w',
+]
+
+
+def test_pickle_decorated_template():
+    assert_that(pickle.loads(pickle.dumps(itemt)), same_instance(itemt))
+
+
+def test_pickle_template():
+    foot = Template('foo', ('@id',), {'bar': 'bar'})
+    copy = pickle.loads(pickle.dumps(foot))
+    assert_that(copy.match, equal_to('foo'))
+    assert_that(copy.targets, equal_to(foot.targets))
+
+
+def count(value):
+    return value
+
+
+def test_pickle_variants():
+    foot = Template('foo', ('@count:int', '@ref:idref'),
+                    {column('d', 'bar/@value'): 'values'}, factory=count)
+    copy = pickle.loads(pickle.dumps(foot))
+
+    assert_that([cls for (cls, paths), name in copy.targets],
+                equal_to([cls for (cls, paths), name in foot.targets]))
+
+
+def test_pickle_omx():
+    ns = Namespace('http://test/ns')
+    omx = OMX((itemt, itemst, ns), 'items')
+    omx.compile()
+
+    copy = pickle.loads(pickle.dumps(omx))
+    assert_that(copy.ns['http://test/ns'].url, equal_to('http://test/ns'))
+    assert_that(copy.get_template('', ['item']), same_instance(itemt))
+
+
+def test_load_many():
+    omx = OMX((itemt, itemst), 'items')
+    results = list(omx.load_many(documents, workers=2, chunksize=3))
+
+    assert_that(results[0], equal_to({'a': 'x'}))
+    assert_that(results[1], instance_of(ValueError))
+    assert_that(results[2], equal_to({'b': 'y', 'c': 'z'}))
+    assert_that(results[3], instance_of(Exception))
+
+
+@template('items', ('item',))
+def lambdat(items):
+    if len(items) > 1:
+        return lambda: items
+    return dict(items)
+
+
+def test_load_many_unpicklable():
+    omx = OMX((itemt, lambdat), 'items')
+    results = list(omx.load_many(documents[::2], workers=2, chunksize=2))
+
+    assert_that(results[0], equal_to({'a': 'x'}))
+    assert_that(results[1], instance_of(Exception))
+
+
+def test_load_many_bounded():
+    omx = OMX((itemt, itemst), 'items')
+    read = []
+
+    def sources():
+        for i in range(100):
+            read.append(i)
+            yield documents[0]
+
+    results = omx.load_many(sources(), workers=1)
+    assert_that(next(results), equal_to({'a': 'x'}))
+    assert_that(len(read), less_than(10))
+    assert_that(len(list(results)), equal_to(99))
+
+
+def test_load_many_unordered():
+    omx = OMX((itemt, itemst), 'items')
+    results = dict(omx.load_many(documents[:3] * 3, workers=2,
+                                 ordered=False))
+
+    assert_that(sorted(results), equal_to(list(range(9))))
+    assert_that(results[8], equal_to({'b': 'y', 'c': 'z'}))
+
+
+def test_load_many_files(tmpdir):
+    paths = []
+    for i, data in enumerate(documents[:3]):
+        path = tmpdir.join('%d.xml' % i)
+        path.write_binary(data)
+        paths.append(str(path))
+
+    omx = OMX((itemt, itemst), 'items', engine='target')
+    results = list(omx.load_many(paths, workers=2))
+    assert_that(results[1], instance_of(ValueError))
+    assert_that(results[2], equal_to({'b': 'y', 'c': 'z'}))
+
+
+@template('entry', ('@key', 'text()'))
+def entryt(key, value):
+    return key, value
+
+
+@entryt.serialiser
+def entryt(dump, obj):
+    dump(*obj)
+
+
+def test_dump_parallel():
+    omx = OMX((entryt,), 'root/entries/entry')
+    data = [('k%d' % i, 'v%d' % i) for i in range(25)]
+
+    out = BytesIO()
+    omx.dump_to(iter(data), out, workers=2, chunksize=4)
+    expected = BytesIO()
+    omx.dump_to(data, expected)
+
+    assert_that(out.getvalue(), equal_to(expected.getvalue()))
+    assert_that(omx.load(BytesIO(out.getvalue())), equal_to(
+        [(key, [value]) for key, value in data]))
+
+
+def test_dump_parallel_single_root():
+    omx = OMX((entryt,), 'entry')
+
+    out = BytesIO()
+    omx.dump_to(('k', 'v'), out, workers=2)
+    assert_that(out.getvalue(), equal_to(b'<entry key="k">v</entry>'))
+
+
+def test_dump_parallel_attribute_root():
+    omx = OMX((), 'root/item/@k')
+
+    out = BytesIO()
+    omx.dump_to(['1', '2'], out, workers=2)
+    assert_that(out.getvalue(), equal_to(
+        b'<root><item k="1"/><item k="2"/></root>'))
+
+
+def test_dump_parallel_stats():
+    omx = OMX((entryt,), 'root/entries/entry')
+
+    with assert_raises(ValueError):
+        omx.dump_to([('k', 'v')], BytesIO(), workers=2, stats=Stats())
+
+
+def test_dump_parallel_empty():
+    omx = OMX((entryt,), 'root/entries/entry')
+
+    out = BytesIO()
+    omx.dump_to([], out, workers=2)
+    assert_that(out.getvalue(), equal_to(b'<root><entries/></root>'))
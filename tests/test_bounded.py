@@ -0,0 +1,95 @@
+import subprocess
+import sys
+import os
+from hamcrest import assert_that, equal_to, less_than
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+from omx import OMX, template
+
+
+@template('item', ('@key', 'text()'))
+def itemt(key, value):
+    return (key, ''.join(value))
+
+
+# Loads a generated document of argv[1] items and prints the peak RSS
+script = '''
+import resource
+import sys
+from omx import OMX, template
+
+@template('item', ('@key', 'text()'))
+def itemt(key, value):
+    return (key, ''.join(value))
+
+class Document(object):
+    def __init__(self, count):
+        self.chunks = self.generate(count)
+
+    def generate(self, count):
+        yield b'<root><items>'
+        for i in range(0, count, 100):
+            yield b''.join(
+                b'<item key="%d">some text</item>' % j
+                for j in range(i, min(i + 100, count)))
+        yield b'</items></root>'
+
+    def read(self, size=-1):
+        return next(self.chunks, b'')
+
+omx = OMX((itemt,), 'root/items/item')
+count = 0
+for obj in omx.iterload(Document(int(sys.argv[1])),
+                        bounded=sys.argv[2] == '1'):
+    count += 1
+assert count == int(sys.argv[1])
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def peak_rss(count, bounded):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] +
+        [p for p in [env.get('PYTHONPATH')] if p])
+    out = subprocess.check_output(
+        [sys.executable, '-c', script, str(count), '1' if bounded else '0'],
+        env=env)
+    return int(out.strip())
+
+
+def test_bounded_load():
+    xmldata = (
+        '<root><items><item key="a">x</item>'
+        '<item key="b">y</item></items></root>')
+    omx = OMX((itemt,), 'root/items/item')
+
+    result = omx.load(StringIO(xmldata.encode('utf-8')), bounded=True)
+    assert_that(result, equal_to([('a', 'x'), ('b', 'y')]))
+
+
+def test_bounded_leading_comment():
+    xmldata = ('<!--c--><?pi x?><root><items><item key="a">x</item>'
+               '</items></root>')
+    omx = OMX((itemt,), 'root/items/item')
+
+    result = omx.load(StringIO(xmldata.encode('utf-8')), bounded=True)
+    assert_that(result, equal_to([('a', 'x')]))
+
+
+def test_bounded_peak_rss():
+    if resource is None:  # pragma: no cover
+        return
+
+    small = peak_rss(2000, True)
+    large = peak_rss(200000, True)
+
+    # ru_maxrss is in kilobytes, allow for some noise in the allocator
+    assert_that(large - small, less_than(4096))
@@ -0,0 +1,94 @@
+from array import array
+from unittest import SkipTest
+from hamcrest import assert_that, equal_to, instance_of
+from .matchers import assert_raises, serializes_as
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+from omx import OMX, Template
+from omx.columns import column, ndcolumn
+
+xmldata = (b'<table><row id="1" on="true">0.5</row>'
+           b'<row id="2" on="false">1.5</row>'
+           b'<row id="3" on="1">-2</row></table>')
+
+
+def test_array():
+    tablet = Template('table', (), {
+        column('l', 'row/@id'): 'ids',
+        column('d', 'row/string()'): 'values',
+    }, factory=lambda ids, values: (ids, values))
+    omx = OMX((tablet,), 'table')
+
+    ids, values = omx.load(StringIO(xmldata))
+
+    assert_that(ids, equal_to(array('l', [1, 2, 3])))
+    assert_that(values, equal_to(array('d', [0.5, 1.5, -2.0])))
+
+
+def test_array_collected():
+    cls, path = column('d', 'row/@value')
+    target = cls('values')
+    target.append('0.5')
+    target.add('2')
+
+    assert_that(target.get(), equal_to(array('d', [0.5, 2.0])))
+
+
+def test_array_typecode():
+    with assert_raises(ValueError):
+        column('u', 'row/@id')
+
+
+def test_array_dump():
+    expected = '<table><row id="1"/><row id="2"/></table>'
+    tablet = Template('table', (), {column('l', 'row/@id'): 'ids'},
+                      serialiser=lambda dump, obj: dump(ids=obj))
+    omx = OMX((tablet,), 'table')
+
+    result = omx.dump(array('l', [1, 2]))
+    assert_that(result, serializes_as(expected))
+
+
+def test_ndarray():
+    try:
+        import numpy
+    except ImportError:
+        raise SkipTest('numpy not installed')
+
+    tablet = Template('table', (), {
+        ndcolumn('i4', 'row/@id'): 'ids',
+        ndcolumn(bool, 'row/@on'): 'flags',
+        ndcolumn('f8', 'row/string()'): 'values',
+    }, factory=lambda ids, flags, values: (ids, flags, values))
+    omx = OMX((tablet,), 'table')
+
+    ids, flags, values = omx.load(StringIO(xmldata))
+
+    assert_that(ids, instance_of(numpy.ndarray))
+    assert_that(ids.dtype, equal_to(numpy.dtype('i4')))
+    assert_that(ids.tolist(), equal_to([1, 2, 3]))
+    assert_that(flags.tolist(), equal_to([True, False, True]))
+    assert_that(values.tolist(), equal_to([0.5, 1.5, -2.0]))
+
+
+def test_ndarray_bool_dump():
+    try:
+        import numpy
+    except ImportError:
+        raise SkipTest('numpy not installed')
+
+    tablet = Template('table', (), {ndcolumn(bool, 'row/@on'): 'flags'},
+                      factory=lambda flags: flags,
+                      serialiser=lambda dump, obj: dump(flags=obj))
+    omx = OMX((tablet,), 'table')
+    flags = numpy.array([True, False])
+
+    out = StringIO()
+    omx.dump(flags).write(out)
+    assert_that(out.getvalue(), equal_to(
+        b'<table><row on="true"/><row on="false"/></table>'))
+    assert_that(omx.load(StringIO(out.getvalue())).tolist(),
+                equal_to([True, False]))
@@ -0,0 +1,74 @@
+from hamcrest import assert_that, equal_to
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+from omx import OMX, Template
+
+
+class Source(object):
+    ''' A file counting the bytes read from it '''
+
+    def __init__(self, data):
+        self.data = StringIO(data)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        chunk = self.data.read(min(size, 1024))
+        self.consumed += len(chunk)
+        return chunk
+
+
+def document(records=20000):
+    body = b''.join(b'<record id="%d"/>' % i for i in range(records))
+    return (b'<root><header name="test" version="2"/><body>' + body +
+            b'</body></root>')
+
+
+headert = Template('header', ('@name', '@version'),
+                   factory=lambda name, version: (name, version))
+
+
+def test_stop():
+    roott = Template('root', ('header[0]',), factory=lambda header: header)
+    data = document()
+
+    for engine in ('iterparse', 'target'):
+        omx = OMX((roott, headert), 'root', engine=engine)
+        source = Source(data)
+        result = omx.load(source, lenient=True, stop_when_complete=True)
+
+        assert_that(result, equal_to(('test', '2')))
+        assert_that(source.consumed < len(data) // 2, equal_to(True))
+
+
+def test_stop_iterload():
+    omx = OMX((headert,), 'root/header[:1]')
+    source = Source(document())
+    result = list(omx.iterload(source, lenient=True, stop_when_complete=True))
+
+    assert_that(result, equal_to([('test', '2')]))
+    assert_that(source.consumed < len(document()) // 2, equal_to(True))
+
+
+def test_text_reads_to_end():
+    roott = Template('root', ('header[0]', 'text()'),
+                     factory=lambda header, text: (header, text))
+    omx = OMX((roott, headert), 'root')
+    data = document(10)
+    source = Source(data)
+    result = omx.load(source, lenient=True, stop_when_complete=True)
+
+    assert_that(result, equal_to((('test', '2'), ['', '', ''])))
+    assert_that(source.consumed, equal_to(len(data)))
+
+
+def test_default_reads_to_end():
+    roott = Template('root', ('header[0]',), factory=lambda header: header)
+    omx = OMX((roott, headert), 'root')
+    data = document(10)
+    source = Source(data)
+    omx.load(source, lenient=True)
+
+    assert_that(source.consumed, equal_to(len(data)))
@@ -0,0 +1,88 @@
+from datetime import datetime
+from decimal import Decimal
+from hamcrest import assert_that, equal_to
+from .matchers import assert_raises, serializes_as
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+from omx import OMX, Template, template
+from omx.decl import target
+
+
+def test_declare_suffix():
+    cls, paths = target('data/@count:int')
+
+    assert_that(paths, equal_to([['data', '@count']]))
+    assert_that(cls.convert('5'), equal_to(5))
+    assert_that(cls.singleton, equal_to(False))
+
+
+def test_declare_type():
+    cls, paths = target((float, '@count'))
+
+    assert_that(paths, equal_to([['@count']]))
+    assert_that(cls.convert('5'), equal_to(5.0))
+    assert_that(cls.singleton, equal_to(True))
+
+
+def test_declare_namespace_prefix():
+    cls, paths = target('f:link', {'f': 'http://dummy/foo'})
+
+    assert_that(paths, equal_to([['{http://dummy/foo}link']]))
+    assert_that(cls.convert, equal_to(None))
+
+
+def test_declare_namespaced_element():
+    cls, paths = target('x:int', {'x': 'http://dummy/x'})
+
+    assert_that(paths, equal_to([['{http://dummy/x}int']]))
+    assert_that(cls.convert, equal_to(None))
+
+
+def test_load():
+    xmldata = ('<foo><data count="5" ratio="0.5" on="true" price="1.10" '
+               'at="2016-01-02T03:04:05"/><data count="7" ratio="2" on="0" '
+               'price="3" at="2016-02-03T04:05:06"/></foo>')
+
+    @template('foo', ('data/@count:int', (float, 'data/@ratio'),
+                      'data/@on:bool', 'data/@price:decimal',
+                      'data/@at:datetime'))
+    def foot(counts, ratios, flags, prices, times):
+        return counts, ratios, flags, prices, times
+
+    omx = OMX((foot,), 'foo')
+    result = omx.load(StringIO(xmldata.encode('utf-8')))
+
+    assert_that(result, equal_to((
+        [5, 7], [0.5, 2.0], [True, False],
+        [Decimal('1.10'), Decimal('3')],
+        [datetime(2016, 1, 2, 3, 4, 5), datetime(2016, 2, 3, 4, 5, 6)])))
+
+
+def test_load_singleton():
+    datat = Template('data', ('@count:int', 'string():float'),
+                     factory=lambda count, value: (count, value))
+    omx = OMX((datat,), 'foo/data')
+    result = omx.load(StringIO(b'<foo><data count="3">1.5</data></foo>'))
+
+    assert_that(result, equal_to([(3, 1.5)]))
+
+
+def test_load_invalid():
+    datat = Template('data', ('@on:bool',), factory=lambda on: on)
+    omx = OMX((datat,), 'data')
+
+    with assert_raises(ValueError):
+        omx.load(StringIO(b'<data on="maybe"/>'))
+
+
+def test_dump():
+    expected = '<foo><data on="true" count="5"/><data on="false" count="7"/></foo>'
+    datat = Template('data', ('@on:bool', '@count:int'),
+                     serialiser=lambda dump, obj: dump(*obj))
+    omx = OMX((datat,), 'foo/data')
+
+    result = omx.dump([(True, 5), (False, 7)])
+    assert_that(result, serializes_as(expected))
@@ -1,8 +1,13 @@
 #!/usr/bin/env python2
 
 from hamcrest import assert_that, equal_to, contains_inanyorder
-from tests.matchers import serializes_as
-from omx import OMX, Template
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+from lxml import etree
+from tests.matchers import assert_raises, serializes_as
+from omx import OMX, Namespace, Target, Template
 
 
 def test_attributes():
@@ -75,3 +80,155 @@ def test_multitarget():
 
     result = omx.dump(['foo', 'bar', 'foo'])
     assert_that(result, serializes_as(expected))
+
+
+def test_dump_to():
+    itemtt = Template(
+        'item', ('@key', 'text()'), {},
+        lambda key, value: (key, ''.join(value)),
+        lambda dump, obj: dump(*obj)
+    )
+    omx = OMX((itemtt,), 'root/items/item')
+    data = [('foo', 'fooz',), ('bar', 'barz')]
+
+    out = StringIO()
+    omx.dump_to(data, out)
+    expected = StringIO()
+    omx.dump(data).write(expected)
+
+    assert_that(out.getvalue(), equal_to(expected.getvalue()))
+
+
+def test_dump_to_generator():
+    expected = ('<root><persons><person name="0"/><person name="1"/>'
+                '<person name="2"/></persons></root>')
+    consumed = []
+
+    def names():
+        for i in range(3):
+            consumed.append(i)
+            yield str(i)
+
+    roott = Template('root', (), {'persons/person/@name': 'names'},
+                     serialiser=lambda dump, obj: dump(names=obj))
+    omx = OMX((roott,), 'root')
+
+    out = StringIO()
+    omx.dump_to(names(), out)
+    assert_that(out.getvalue().decode('utf-8'), equal_to(expected))
+    assert_that(consumed, equal_to([0, 1, 2]))
+
+
+def test_string():
+    expected = '<root><item key="foo">fooz</item></root>'
+    itemt = Template('item', ('@key', 'string()'), {},
+                     lambda key, value: (key, value),
+                     lambda dump, obj: dump(*obj))
+    omx = OMX((itemt,), 'root/item')
+    result = omx.dump([('foo', 'fooz')])
+    assert_that(result, serializes_as(expected))
+
+    out = StringIO()
+    result.write(out)
+    loaded = omx.load(StringIO(out.getvalue()))
+    assert_that(loaded, equal_to([('foo', 'fooz')]))
+
+
+def test_intermediate_empty():
+    expected = '<root/>'
+    roott = Template('root', (), {'persons/person/@name': 'names'},
+                     serialiser=lambda dump, obj: dump(names=obj))
+    omx = OMX((roott,), 'root')
+
+    result = omx.dump([])
+    assert_that(result, serializes_as(expected))
+
+
+def test_parent_attributes():
+    expected = '<root><item key="a" value="1"/><item key="b" value="2"/></root>'
+    roott = Template('root', ('item', 'item/@key'),
+                     serialiser=lambda dump, obj: dump(
+                         [v for k, v in obj], [k for k, v in obj]))
+    itemt = Template('item', ('@value',),
+                     serialiser=lambda dump, obj: dump(obj))
+    omx = OMX((roott, itemt), 'root')
+
+    result = omx.dump([('a', '1'), ('b', '2')])
+    assert_that(result, serializes_as(expected))
+
+
+def test_namespace():
+    foo = Namespace('http://dummy/foo')
+
+    @foo.template('item', ('@key',))
+    def itemt(key):
+        return key
+
+    itemt.serialiser(lambda dump, obj: dump(obj))
+
+    @foo.template('root', ('item',))
+    def roott(items):
+        return items
+
+    roott.serialiser(lambda dump, obj: dump(obj))
+
+    omx = OMX((foo,), '{http://dummy/foo}root')
+    out = StringIO()
+    omx.dump(['a', 'b']).write(out)
+    assert_that(omx.load(StringIO(out.getvalue())), equal_to(['a', 'b']))
+
+
+def test_namespace_dump_to():
+    foo = Namespace('http://dummy/foo')
+
+    @foo.template('item', ('@key', 'text()'))
+    def itemt(key, text):
+        return key, text
+
+    itemt.serialiser(lambda dump, obj: dump(*obj))
+    omx = OMX((foo,), '{http://dummy/foo}root/{http://dummy/foo}item')
+    data = [('a', 'x'), ('b', '')]
+
+    out = StringIO()
+    omx.dump_to(data, out)
+    expected = etree.tostring(omx.dump(data), method='c14n')
+
+    assert_that(out.getvalue().count(b'xmlns'), equal_to(1))
+    assert_that(etree.tostring(etree.fromstring(out.getvalue()),
+                               method='c14n'), equal_to(expected))
+
+
+def test_empty_root():
+    itemt = Template('item', ('@k',), serialiser=lambda dump, obj: dump(obj))
+    omx = OMX((itemt,), 'root/items/item')
+    expected = '<root><items/></root>'
+
+    assert_that(omx.dump([]), serializes_as(expected))
+    out = StringIO()
+    omx.dump_to([], out)
+    assert_that(out.getvalue(), equal_to(expected.encode('utf-8')))
+
+
+def test_leftover_attribute():
+    itemt = Template('item', ('@v',), serialiser=lambda dump, obj: dump(obj))
+    roott = Template('root', ('item', 'item/@x'),
+                     serialiser=lambda dump, obj: dump(*obj))
+    omx = OMX((roott, itemt), 'root')
+
+    with assert_raises(Exception):
+        omx.dump((['1'], ['a', 'b']))
+
+
+class BrokenTarget(Target):
+    def pop(self):
+        raise KeyError('broken')
+
+
+def test_target_error():
+    itemt = Template('item', ((BrokenTarget, 'sub'),),
+                     serialiser=lambda dump, obj: dump(obj))
+    subt = Template('sub', ())
+    omx = OMX((itemt, subt), 'root/item')
+
+    with assert_raises(KeyError):
+        omx.dump(['a'])
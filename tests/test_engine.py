@@ -0,0 +1,176 @@
+from hamcrest import assert_that, equal_to, instance_of
+from .matchers import assert_raises
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+from omx import OMX, Namespace, Template, template
+
+
+@template('root', ('item', 'text()', 'context()'))
+def roott(items, text, context):
+    return items, text, sorted(context['ids'])
+
+
+@template('item', ('@key', 'text()', 'sub/@value'))
+def itemt(key, text, values):
+    return key, text, values
+
+
+xmldata = (
+    '<root>head<item id="a" key="foo" other="x">one<sub value="1"/>two'
+    '<sub value="2"/></item>middle<item id="b" key="bar"/>tail</root>')
+
+nsdata = (
+    '<root xmlns:f="http://dummy/foo"><f:link f:desc="d" date="now"/>'
+    '<link xmlns="http://dummy/foo"/></root>')
+
+
+def load(engine, data, *args, **kwargs):
+    omx = OMX(*args, engine=engine)
+    return omx.load(StringIO(data.encode('utf-8')), **kwargs)
+
+
+def test_identical():
+    expected = load('iterparse', xmldata, (roott, itemt), 'root')
+    result = load('target', xmldata, (roott, itemt), 'root')
+
+    assert_that(result, equal_to(expected))
+    assert_that(result, equal_to((
+        [('foo', ['one', 'two', ''], ['1', '2']), ('bar', [''], [])],
+        ['head', 'middle', 'tail'],
+        ['a', 'b'])))
+
+
+def test_identical_namespace():
+    foo = Namespace('http://dummy/foo')
+
+    @foo.template('link', (), {'@self:desc': 'desc', '@date': 'date'})
+    def link(desc=None, date=None):
+        return desc, date
+
+    rootns = Namespace('', {'f': 'http://dummy/foo'})
+
+    @rootns.template('root', ('f:link',))
+    def root(links):
+        return links
+
+    expected = load('iterparse', nsdata, (foo, rootns), 'root')
+    result = load('target', nsdata, (foo, rootns), 'root')
+
+    assert_that(result, equal_to(expected))
+    assert_that(result, equal_to([('d', 'now'), (None, None)]))
+
+
+def test_identical_lenient():
+    data = '<root>a<skip>b<item key="x"/>c</skip>d<item key="y"/></root>'
+
+    expected = load('iterparse', data, (roott, itemt), 'root', lenient=True)
+    result = load('target', data, (roott, itemt), 'root', lenient=True)
+
+    assert_that(result, equal_to(expected))
+    assert_that(result[1], equal_to(['a', 'd', '']))
+
+
+def test_identical_string():
+    @template('root', ('item', 'string()'))
+    def stringt(items, text):
+        return items, text
+
+    @template('item', ('normalize-space()',))
+    def spacet(text):
+        return text
+
+    data = ('<root> a <item>\n  one\t<sub/> two  </item>b'
+            '<item/><skip>c</skip></root>')
+
+    expected = load('iterparse', data, (stringt, spacet), 'root',
+                    lenient=True)
+    result = load('target', data, (stringt, spacet), 'root', lenient=True)
+
+    assert_that(result, equal_to(expected))
+    assert_that(result, equal_to((['one two', ''], ' a b')))
+
+
+def test_comments():
+    foot = Template('foo', ('text()',), factory=lambda text: text)
+    data = '<foo>a<!--c-->b<bar/>c<?pi x?>d</foo>'
+
+    for engine in ('iterparse', 'target'):
+        result = load(engine, data, (foot,), 'foo', lenient=True)
+        assert_that(result, equal_to(['ab', 'cd']))
+
+
+def test_comments_large():
+    # Large enough for the parser to stop between a node and its tail
+    itemt = Template('item', ('string()',), factory=lambda text: text)
+    count = 20000
+    data = '<root>%s</root>' % ''.join(
+        '<item>a%d<!--x-->b%d<z/>c%d<?pi x?>d</item>' % (i, i, i)
+        for i in range(count))
+    expected = ['a%db%dc%dd' % (i, i, i) for i in range(count)]
+
+    for engine in ('iterparse', 'target'):
+        result = load(engine, data, (itemt,), 'root/item', lenient=True)
+        assert_that(result, equal_to(expected))
+
+
+def test_iterload():
+    omx = OMX((itemt,), 'root/item', engine='target')
+    result = omx.iterload(StringIO(xmldata.encode('utf-8')),
+                          lenient=True)
+
+    assert_that([key for key, text, values in result],
+                equal_to(['foo', 'bar']))
+
+
+def test_incomplete():
+    omx = OMX((roott, itemt), 'root', engine='target')
+
+    with assert_raises(Exception):
+        omx.load(StringIO(b'<root><item>'))
+
+
+def failing(value):
+    raise ValueError(value)
+
+
+failt = Template('item', ('@key',), factory=failing)
+errors = (
+    ('<root><item key="x"/></root>', ValueError, 'x'),
+    ('<root><baz/></root>', Exception, "element without target 'baz'"),
+)
+
+
+def test_errors():
+    for engine in ('iterparse', 'target'):
+        omx = OMX((roott, failt), 'root', engine=engine)
+        for data, cls, message in errors:
+            with assert_raises(instance_of(cls)) as raised:
+                omx.load(StringIO(data.encode('utf-8')))
+            assert_that(str(raised.exception), equal_to(message))
+
+
+def test_loader_errors():
+    omx = OMX((roott, failt), 'root')
+    for data, cls, message in errors:
+        loader = omx.loader()
+        with assert_raises(instance_of(cls)) as raised:
+            loader.feed(data.encode('utf-8'))
+            loader.close()
+        assert_that(str(raised.exception), equal_to(message))
+
+
+def test_unknown_engine():
+    with assert_raises(KeyError):
+        OMX((roott,), 'root', engine='sax')
+
+
+def test_ids_unread():
+    omx = OMX((itemt,), 'root/item')
+    loader = omx.loader()
+    loader.feed(xmldata.encode('utf-8'))
+    loader.close()
+
+    assert_that(loader.state.index, equal_to({}))
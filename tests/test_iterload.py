@@ -0,0 +1,76 @@
+from hamcrest import assert_that, equal_to
+from .matchers import assert_raises
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+from omx import OMX, template
+
+
+@template('item', ('@key', 'text()'))
+def itemt(key, value):
+    return (key, ''.join(value))
+
+
+class Chunks(object):
+    '''A file like object handing out one chunk per read'''
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        if self.consumed == len(self.chunks):
+            return b''
+        self.consumed += 1
+        return self.chunks[self.consumed - 1]
+
+
+def test_iterload():
+    xmldata = (
+        '<root><items><item key="foo">fooz</item>'
+        '<item key="bar">barz</item></items></root>')
+    omx = OMX((itemt,), 'root')
+
+    result = omx.iterload(StringIO(xmldata.encode('utf-8')),
+                          'root/items/item')
+    assert_that(list(result), equal_to([('foo', 'fooz'), ('bar', 'barz')]))
+
+
+def test_iterload_default_root():
+    xmldata = '<root><item key="foo">fooz</item><item key="bar"/></root>'
+    omx = OMX((itemt,), 'root/item')
+
+    result = omx.iterload(StringIO(xmldata.encode('utf-8')))
+    assert_that(list(result), equal_to([('foo', 'fooz'), ('bar', '')]))
+
+
+def test_iterload_attributes():
+    xmldata = '<root><item key="foo"/><item key="bar"/></root>'
+    omx = OMX((), 'root')
+
+    result = omx.iterload(StringIO(xmldata.encode('utf-8')),
+                          'root/item/@key')
+    assert_that(list(result), equal_to(['foo', 'bar']))
+
+
+def test_iterload_lazy():
+    chunks = [b'<root>'] + [
+        ('<item key="%d"/>' % i).encode('utf-8') for i in range(1000)
+    ] + [b'</root>']
+    source = Chunks(chunks)
+    omx = OMX((itemt,), 'root/item')
+
+    result = omx.iterload(source)
+    assert_that(next(result), equal_to(('0', '')))
+    assert source.consumed < len(chunks)
+    assert_that(len(list(result)), equal_to(999))
+
+
+def test_iterload_incomplete():
+    omx = OMX((itemt,), 'root/item')
+
+    result = omx.iterload(StringIO(b'<root><item key="a"/><item>'))
+    with assert_raises(Exception):
+        list(result)
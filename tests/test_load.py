@@ -192,5 +192,28 @@ class Context(OMXTest):
         assert_that(result, contains_inanyorder('FOO', 'BAR'))
 
 
+class Lenient(OMXTest):
+    xmldata = (
+        '<root>a<ext:data xmlns:ext="http://vendor"><foo>x</foo></ext:data>'
+        'b<foo>y</foo>c<other/></root>')
+
+    def test_strict(self):
+        roott = Template('root', ('foo',), {}, lambda foo: foo)
+        foot = Template('foo', ('text()',), {}, lambda text: ''.join(text))
+        omx = OMX((roott, foot), 'root')
+
+        with assert_raises(Exception):
+            omx.load(self.data)
+
+    def test_skip(self):
+        roott = Template('root', ('foo', 'text()'), {},
+                         lambda foo, text: (foo, ''.join(text)))
+        foot = Template('foo', ('text()',), {}, lambda text: ''.join(text))
+        omx = OMX((roott, foot), 'root')
+
+        result = omx.load(self.data, lenient=True)
+        assert_that(result, equal_to((['y'], 'abc')))
+
+
 if __name__ == '__main__':
     unittest.main()
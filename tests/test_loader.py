@@ -0,0 +1,51 @@
+from hamcrest import assert_that, equal_to
+from .matchers import assert_raises
+
+from omx import OMX, Template
+
+messaget = Template('message', ('@from', 'string()'),
+                    factory=lambda sender, body: (sender, body))
+streamt = Template('stream', ('message',), factory=lambda messages: messages)
+
+
+def test_stream():
+    omx = OMX((messaget,), 'stream/message')
+    loader = omx.loader()
+
+    loader.feed(b'<stream><message from="a">hel')
+    assert_that(loader.collect(), equal_to([]))
+    loader.feed(b'lo</message><message from="b">one</message>'
+                b'<message from="c">')
+    assert_that(loader.collect(), equal_to([('a', 'hello'), ('b', 'one')]))
+    loader.feed(b'two</message>')
+    assert_that(loader.collect(), equal_to([('c', 'two')]))
+    loader.feed(b'</stream>')
+    assert_that(loader.close(), equal_to([]))
+
+
+def test_document():
+    omx = OMX((streamt, messaget), 'stream')
+    loader = omx.loader()
+    data = b'<stream><message from="a">x</message></stream>'
+    for i in range(len(data)):
+        loader.feed(data[i:i + 1])
+
+    assert_that(loader.close(), equal_to([[('a', 'x')]]))
+
+
+def test_incomplete():
+    omx = OMX((messaget,), 'stream/message')
+    loader = omx.loader()
+    loader.feed(b'<stream><message from="a">x</message>')
+
+    with assert_raises(Exception):
+        loader.close()
+
+
+def test_stop_when_complete():
+    omx = OMX((messaget,), 'stream/message[0]')
+    loader = omx.loader(stop_when_complete=True)
+    loader.feed(b'<stream><message from="a">x</message><message ')
+    loader.feed(b'invalid xml')
+
+    assert_that(loader.close(), equal_to([('a', 'x')]))
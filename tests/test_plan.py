@@ -0,0 +1,164 @@
+from hamcrest import assert_that, equal_to, same_instance, none, instance_of
+from .matchers import assert_raises
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+from omx import OMX, Singleton, Target, Template, template
+from omx.plan import tree
+
+
+def test_tree():
+    foot = Template('foo', ('@id', 'bar/text()', 'bar', 'context()'))
+    node = tree(foot.targets)
+
+    assert_that(node.attributes, equal_to({'id': 0}))
+    assert_that(node.context, equal_to(3))
+    assert_that(node.children['bar'].slot, equal_to(2))
+    assert_that(node.children['bar'].text, equal_to(1))
+
+
+def test_tree_conflict():
+    foot = Template('foo', ('bar', 'bar|baz'))
+    with assert_raises(Exception):
+        tree(foot.targets)
+
+
+def test_recursive_states_shared():
+    rect = Template('rec', ('rec',))
+    omx = OMX((rect,), 'rec')
+    machine = omx.machine()
+
+    first = machine.root.transitions['rec']
+    second = first.transitions['rec']
+    third = second.transitions['rec']
+
+    assert_that(third, same_instance(second))
+    assert_that(omx.machine(), same_instance(machine))
+
+
+def test_unmapped_transition():
+    foot = Template('foo')
+    omx = OMX((foot,), 'foo')
+    state = omx.machine().root.transitions['foo']
+
+    assert_that(state.transitions['bar'], none())
+
+
+def test_load_recursive():
+    xmldata = '<rec><rec><rec/></rec><rec/></rec>'
+
+    @template('rec', ('rec',))
+    def rect(children):
+        return len(children) + sum(children)
+
+    omx = OMX((rect,), 'rec')
+    result = omx.load(StringIO(xmldata.encode('utf-8')))
+    assert_that(result, equal_to(3))
+
+
+def test_load_shared_parent_path():
+    xmldata = '<root><foo x="1"><bar/></foo><foo x="2"/></root>'
+
+    @template('root', ('foo/@x', 'foo'))
+    def roott(xs, foos):
+        return xs, foos
+
+    @template('foo', ('bar',))
+    def foot(bars):
+        return len(bars)
+
+    @template('bar')
+    def bart():
+        return 'bar'
+
+    omx = OMX((roott, foot, bart), 'root')
+    result = omx.load(StringIO(xmldata.encode('utf-8')))
+    assert_that(result, equal_to((['1', '2'], [1, 0])))
+
+
+def test_template_plan_layout():
+    foot = Template('foo', ('@id', 'bar'), {'baz/text()': 'baz'})
+    omx = OMX((foot,), 'foo')
+    plan = omx.plan(foot)
+
+    assert_that(plan.positional, equal_to(((1, True), (2, False))))
+    assert_that(plan.keyword, equal_to(((0, 'baz', False),)))
+    assert_that(omx.plan(foot), same_instance(plan))
+
+
+def test_template_plan_compact():
+    class Float(Target):
+        pass
+
+    foot = Template('foo', ('@id', (Float, 'bar/@value'), 'baz'))
+    data = OMX((foot,), 'foo').plan(foot).data()
+    plain, custom, repeated = data.values
+
+    assert_that(plain, equal_to([]))
+    assert_that(repeated, equal_to([]))
+    assert_that(custom, instance_of(Float))
+    assert_that(custom.pattern, equal_to('bar/@value'))
+
+
+def test_singleton_set_twice():
+    foot = Template('foo', ((Singleton, 'bar'),))
+    bart = Template('bar')
+    omx = OMX((foot, bart), 'foo')
+
+    with assert_raises(Exception):
+        omx.load(StringIO(b'<foo><bar/><bar/></foo>'))
+
+
+def test_compile_reused():
+    xmldata = '<foo id="x"><bar/><bar/></foo>'
+
+    @template('foo', ('@id', 'bar'))
+    def foot(uid, bars):
+        return uid, bars
+
+    @template('bar')
+    def bart():
+        return 'bar'
+
+    omx = OMX((foot, bart), 'foo').compile()
+    machine = omx.machine()
+    states = dict(machine._states)
+
+    for _ in range(2):
+        result = omx.load(StringIO(xmldata.encode('utf-8')))
+        assert_that(result, equal_to(('x', ['bar', 'bar'])))
+
+    assert_that(machine._states, equal_to(states))
+
+
+def test_compile_missing_template():
+    foot = Template('foo', ('bar',))
+    omx = OMX((foot,), 'foo').compile()
+
+    with assert_raises(KeyError):
+        omx.load(StringIO(b'<foo><bar/></foo>'))
+
+
+def test_state_attributes():
+    foot = Template('foo', ('@id', 'bar/@key'))
+    omx = OMX((foot,), 'foo')
+    state = omx.machine().root.transitions['foo']
+
+    assert_that(state.attributes, equal_to((('id', -1, 0),)))
+    assert_that(state.transitions['bar'].attributes,
+                equal_to((('key', -1, 1),)))
+
+
+def test_load_unmapped_attributes():
+    attributes = ' '.join('a%d="%d"' % (i, i) for i in range(30))
+    xmldata = '<foo %s><bar %s key="k"/></foo>' % (attributes, attributes)
+
+    @template('foo', ('@a7', 'bar/@key'), {'@missing': 'missing'})
+    def foot(a7, keys, missing=None):
+        return a7, keys, missing
+
+    omx = OMX((foot,), 'foo')
+    result = omx.load(StringIO(xmldata.encode('utf-8')))
+    assert_that(result, equal_to(('7', ['k'], None)))
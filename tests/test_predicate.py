@@ -0,0 +1,105 @@
+from hamcrest import assert_that, equal_to
+from .matchers import assert_raises, serializes_as
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+from omx import OMX, Singleton, Target, Template
+from omx.decl import target, window
+
+xmldata = (b'<root><item key="a"><sub v="1"/><sub v="2"/></item>'
+           b'<item key="b"><sub v="3"/></item><other/>'
+           b'<item key="c"/><item key="d"/></root>')
+
+created = []
+
+
+def itemfactory(key):
+    created.append(key)
+    return key
+
+
+itemt = Template('item', ('@key',), factory=itemfactory,
+                 serialiser=lambda dump, obj: dump(obj))
+
+
+def load(roott, engine='iterparse'):
+    del created[:]
+    omx = OMX((roott, itemt), 'root', engine=engine)
+    return omx.load(StringIO(xmldata), lenient=True)
+
+
+def test_window():
+    assert_that(window('item'), equal_to(('item', None)))
+    assert_that(window('item[2]'), equal_to(('item', (2, 3))))
+    assert_that(window('item[:10]'), equal_to(('item', (0, 10))))
+    assert_that(window('item[2:]'), equal_to(('item', (2, None))))
+    assert_that(window('{http://dummy}item[1:3]'),
+                equal_to(('{http://dummy}item', (1, 3))))
+
+    with assert_raises(ValueError):
+        window('item[]')
+
+
+def test_singleton():
+    assert_that(target('item[0]')[0], equal_to(Singleton))
+    assert_that(target('item[0]/sub[1]/@v')[0], equal_to(Singleton))
+    assert_that(target('item[:1]')[0], equal_to(Target))
+    assert_that(target('item[0]/sub/@v')[0], equal_to(Target))
+
+
+def test_first():
+    roott = Template('root', ('item[0]',), factory=lambda item: item)
+
+    assert_that(load(roott), equal_to('a'))
+    assert_that(created, equal_to(['a']))
+
+
+def test_range():
+    roott = Template('root', ('item[1:3]',), factory=lambda items: items)
+
+    assert_that(load(roott), equal_to(['b', 'c']))
+    assert_that(created, equal_to(['b', 'c']))
+    assert_that(load(roott, 'target'), equal_to(['b', 'c']))
+
+
+def test_per_parent():
+    roott = Template('root', ('item[:2]/sub[0]/@v',),
+                     factory=lambda values: values)
+
+    assert_that(load(roott), equal_to(['1', '3']))
+
+
+def test_missing():
+    roott = Template('root', ('item[9]',), factory=lambda item: item)
+
+    with assert_raises(Exception):
+        load(roott)
+
+
+def test_conflict():
+    roott = Template('root', ('item[0]', 'item/@key'))
+
+    with assert_raises(Exception):
+        OMX((roott, itemt), 'root').load(StringIO(xmldata))
+
+
+def test_text_skipped():
+    roott = Template('root', ('item[0]', 'text()'),
+                     factory=lambda item, text: text)
+    omx = OMX((roott, itemt), 'root')
+    result = omx.load(StringIO(b'<root>a<item key="x"/>b<item key="y"/>c'
+                               b'</root>'))
+
+    assert_that(result, equal_to(['a', 'b', 'c']))
+
+
+def test_dump():
+    roott = Template('root', ('item[:2]',),
+                     serialiser=lambda dump, obj: dump(obj))
+    omx = OMX((roott, itemt), 'root')
+
+    result = omx.dump(['a', 'b'])
+    assert_that(result, serializes_as(
+        '<root><item key="a"/><item key="b"/></root>'))
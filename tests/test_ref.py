@@ -0,0 +1,125 @@
+from hamcrest import assert_that, equal_to, instance_of, is_
+from .matchers import assert_raises, serializes_as
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+from omx import OMX, Template
+from omx.ref import Reference
+
+xmldata = (b'<graph><node id="a"/><node id="b" next="a"/>'
+           b'<edge from="a" to="c"/><edge from="b" to="a b"/>'
+           b'<node id="c" next="a"/></graph>')
+
+
+class Node(object):
+    def __init__(self, id, next=None):
+        self.id = id
+        self.next = next
+
+
+graphdata = Template('graph', ('node', 'edge'),
+                     factory=lambda nodes, edges: (nodes, edges),
+                     serialiser=lambda dump, obj: dump(*obj))
+nodet = Template('node', ('@id',), {'@next:idref': 'next'}, factory=Node,
+                 serialiser=lambda dump, obj: dump(obj.id, next=obj.next))
+edget = Template('edge', ('@from:idref', '@to:idrefs'),
+                 factory=lambda source, targets: (source, targets))
+
+
+def load(data, engine='iterparse', **kwargs):
+    omx = OMX((graphdata, nodet, edget), 'graph', engine=engine)
+    return omx.load(StringIO(data), **kwargs)
+
+
+def test_backward():
+    for engine in ('iterparse', 'target'):
+        (a, b, c), edges = load(xmldata, engine)
+
+        assert_that(b.next, is_(a))
+        assert_that(edges[1], equal_to((b, [a, b])))
+
+
+def test_forward():
+    (a, b, c), edges = load(xmldata)
+    source, (target,) = edges[0]
+
+    assert_that(source, is_(a))
+    assert_that(target, instance_of(Reference))
+    assert_that(target.resolved, equal_to(True))
+    assert_that(target.obj, is_(c))
+
+
+def test_ancestor():
+    nestt = Template('node', ('@id', 'node'), {'@up:idref': 'up'},
+                     factory=lambda id, children, up=None: (id, up, children))
+    omx = OMX((nestt,), 'node')
+
+    outer = omx.load(StringIO(b'<node id="x"><node id="y" up="x"/></node>'))
+    up = outer[2][0][1]
+
+    assert_that(up.resolved, equal_to(True))
+    assert_that(up.obj, is_(outer))
+
+
+def test_unresolved():
+    with assert_raises(Exception) as raised:
+        load(b'<graph><node id="a" next="z"/></graph>')
+    assert_that(str(raised.exception),
+                equal_to("unresolved references to 'z'"))
+
+
+def test_unresolved_lenient():
+    (a,), edges = load(b'<graph><node id="a" next="z"/></graph>',
+                       lenient=True)
+
+    assert_that(a.next.id, equal_to('z'))
+    assert_that(a.next.resolved, equal_to(False))
+
+
+def test_referenced_only():
+    omx = OMX((graphdata, nodet, edget), 'graph')
+    loader = omx.loader(ids=False)
+    loader.feed(b'<graph><edge from="b" to="a"/><node id="a"/><node id="b"/>'
+                b'<node id="c" next="a"/></graph>')
+    [((a, b, c), ((source, (target,)),))] = loader.close()
+
+    assert_that(sorted(loader.state.index), equal_to(['a', 'b']))
+    assert_that(source.obj, is_(b))
+    assert_that(target.obj, is_(a))
+    assert_that(c.next, is_(a))
+
+
+def test_referenced_container():
+    omx = OMX((graphdata, nodet, edget), 'graph')
+    loader = omx.loader(ids=set(['a']))
+    loader.feed(xmldata[:xmldata.index(b'<edge from="b"')])
+
+    assert_that(sorted(loader.state.index), equal_to(['a']))
+    assert_that(loader.state.dropped, equal_to(set(['b'])))
+
+
+def test_referenced_dropped():
+    omx = OMX((graphdata, nodet, edget), 'graph')
+    loader = omx.loader(ids=set(['a']))
+
+    with assert_raises(Exception) as raised:
+        loader.feed(xmldata)
+        loader.close()
+    assert_that(str(raised.exception),
+                equal_to("reference to 'b' which was not kept"))
+
+
+def test_not_attribute():
+    with assert_raises(ValueError):
+        Template('edge', ('string():idref',))
+
+
+def test_dump():
+    a = Node('a')
+    expected = '<graph><node id="a"/><node next="a" id="b"/></graph>'
+    omx = OMX((graphdata, nodet, edget), 'graph')
+
+    result = omx.dump(([a, Node('b', a)], []))
+    assert_that(result, serializes_as(expected))
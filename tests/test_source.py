@@ -0,0 +1,107 @@
+import bz2
+import gzip
+import lzma
+import mmap
+import pathlib
+from io import BytesIO
+from hamcrest import assert_that, equal_to
+
+from omx import OMX, Template
+from omx.load import BufferReader, reader
+
+itemt = Template('item', ('@key',), factory=lambda key: key)
+roott = Template('root', ('item',), factory=lambda items: items)
+
+xmldata = b'<root><item key="a"/><item key="b"/></root>'
+engines = ('iterparse', 'target')
+
+
+def sources(tmpdir):
+    path = tmpdir.join('doc.xml')
+    path.write_binary(xmldata)
+    yield str(path)
+    yield pathlib.Path(str(path))
+    yield xmldata
+    yield bytearray(xmldata)
+    yield memoryview(xmldata)
+    with open(str(path), 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    yield mapped
+    mapped.close()
+
+
+def test_load(tmpdir):
+    for engine in engines:
+        omx = OMX((roott, itemt), 'root', engine=engine)
+        for source in sources(tmpdir):
+            assert_that(omx.load(source), equal_to(['a', 'b']))
+
+
+def test_iterload(tmpdir):
+    for engine in engines:
+        omx = OMX((itemt,), 'root/item', engine=engine)
+        for source in sources(tmpdir):
+            assert_that(list(omx.iterload(source)), equal_to(['a', 'b']))
+
+
+def test_buffer_reader():
+    reader = BufferReader(bytearray(b'abcdef'))
+
+    assert_that(reader.read(4), equal_to(b'abcd'))
+    assert_that(reader.read(4), equal_to(b'ef'))
+    assert_that(reader.read(4), equal_to(b''))
+
+
+def compressed(tmpdir):
+    for name, compress in (('gz', gzip.compress), ('bz2', bz2.compress),
+                           ('xz', lzma.compress)):
+        data = compress(xmldata)
+        path = tmpdir.join('doc.xml.' + name)
+        path.write_binary(data)
+        yield str(path)
+        yield data
+        yield bytearray(data)
+        yield BytesIO(data)
+        yield Stream(data)
+
+
+class Stream(object):
+    ''' A file-like object that can only be read '''
+
+    def __init__(self, data):
+        self.data = BytesIO(data)
+
+    def read(self, size=-1):
+        return self.data.read(size)
+
+
+def test_load_compressed(tmpdir):
+    for engine in engines:
+        omx = OMX((roott, itemt), 'root', engine=engine)
+        for source in compressed(tmpdir):
+            assert_that(omx.load(source), equal_to(['a', 'b']))
+
+
+def test_iterload_compressed(tmpdir):
+    for engine in engines:
+        omx = OMX((itemt,), 'root/item', engine=engine)
+        for source in compressed(tmpdir):
+            assert_that(list(omx.iterload(source)), equal_to(['a', 'b']))
+
+
+def test_file_left_open(tmpdir):
+    omx = OMX((roott, itemt), 'root')
+    f = BytesIO(gzip.compress(xmldata))
+    omx.load(f)
+
+    assert_that(f.closed, equal_to(False))
+
+
+def test_native_gzip(tmpdir):
+    path = tmpdir.join('doc.xml.gz')
+    path.write_binary(gzip.compress(xmldata))
+
+    assert_that(reader(str(path), native=True), equal_to(str(path)))
+    opened = reader(str(path))
+    assert_that(opened.read(), equal_to(xmldata))
+    opened.close()
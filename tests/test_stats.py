@@ -0,0 +1,94 @@
+from hamcrest import assert_that, equal_to, greater_than, less_than
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+import time
+
+from omx import OMX, Target, Template
+from omx.stats import Stats
+
+roott = Template('root', ('item',), factory=lambda items: items,
+                 serialiser=lambda dump, obj: dump(obj))
+itemt = Template('item', ('@key',), factory=lambda key: key,
+                 serialiser=lambda dump, obj: dump(obj))
+
+xmldata = b'<root><item key="a"/><item key="b"/><item key="c"/></root>'
+
+
+def test_load():
+    omx = OMX((roott, itemt), 'root')
+    stats = Stats()
+    result = omx.load(StringIO(xmldata), stats=stats)
+
+    assert_that(result, equal_to(['a', 'b', 'c']))
+    assert_that(stats.templates[itemt].count, equal_to(3))
+    assert_that(stats.templates[roott].count, equal_to(1))
+    assert_that(stats.templates[itemt].create, greater_than(0))
+    assert_that(stats.seconds, greater_than(stats.handling))
+    assert_that(stats.internal, greater_than(0))
+
+
+def test_load_accumulates():
+    omx = OMX((roott, itemt), 'root', engine='target')
+    stats = Stats()
+    omx.load(StringIO(xmldata), stats=stats)
+    omx.load(StringIO(xmldata), stats=stats)
+
+    assert_that(stats.templates[itemt].count, equal_to(6))
+
+
+def test_callback():
+    omx = OMX((roott, itemt), 'root')
+    reported = []
+    omx.load(StringIO(xmldata), stats=reported.append)
+
+    assert_that(len(reported), equal_to(1))
+    assert_that(reported[0].templates[itemt].count, equal_to(3))
+
+
+def test_dump():
+    omx = OMX((roott, itemt), 'root')
+    stats = Stats()
+    omx.dump(['a', 'b'], stats=stats)
+
+    assert_that(stats.templates[itemt].count, equal_to(2))
+    assert_that(stats.templates[itemt].serialise, greater_than(0))
+    assert_that(stats.templates[roott].count, equal_to(1))
+
+
+def test_dump_to():
+    omx = OMX((roott, itemt), 'root')
+    stats = Stats()
+    out = StringIO()
+    omx.dump_to(['a', 'b'], out, stats=stats)
+
+    assert_that(out.getvalue(), equal_to(
+        b'<root><item key="a"/><item key="b"/></root>'))
+    assert_that(stats.templates[itemt].count, equal_to(2))
+
+
+class SlowTarget(Target):
+    def get(self):
+        time.sleep(0.02)
+        return Target.get(self)
+
+    def set(self, d):
+        time.sleep(0.02)
+        Target.set(self, d)
+
+
+def test_factory_alone():
+    slowt = Template('root', ((SlowTarget, 'item/@key'),),
+                     factory=lambda keys: keys,
+                     serialiser=lambda dump, obj: dump(obj))
+    omx = OMX((slowt,), 'root')
+    stats = Stats()
+
+    result = omx.load(StringIO(xmldata), stats=stats)
+    omx.dump(result, stats=stats)
+
+    assert_that(stats.templates[slowt].create, less_than(0.01))
+    assert_that(stats.templates[slowt].serialise, less_than(0.01))
+    assert_that(stats.internal, greater_than(0.04))
@@ -1,10 +1,9 @@
 #!/usr/bin/env python2
 
 import unittest
-from mock import Mock
 
 from omx import template
-from omx.core import TemplateData, Target
+from omx.core import TemplatePlan
 
 
 @template('foo', ('aa', 'bb'))
@@ -13,12 +12,8 @@ def positional(aa, bb):
 
 
 class TestCreate(unittest.TestCase):
-    def setUp(self):
-        self.state = Mock()
-        self.state.add_target = lambda path, name: Target(name)
-
     def test_positional(self):
-        t = TemplateData(positional, self.state)
+        t = TemplatePlan(positional).data(handles=True)
         self.assertEqual(len(t.values), 2)
         a, b = t.values
         self.assertEqual(None, a.name)